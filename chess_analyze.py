@@ -0,0 +1,234 @@
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import chess_engine
+from chess_engine import TranspositionTable, find_best_move
+from chess_logic import BACKENDS, create_logic, move_name
+from chess_tablebase import TABLEBASE_DIR, Tablebases
+
+# Positions are read one line at a time and at most a few per worker are in
+# flight, so input of any length runs in constant memory. Results are written
+# in input order, which lets --resume continue after the last complete line.
+# Every worker keeps its own board, transposition table and tablebases for all
+# the positions it is given.
+DEPTH = 4
+SEED = 2024
+IN_FLIGHT = 4
+REPORT_EVERY = 100
+EPD_OPERATION = re.compile(r'(\w+)\s+("[^"]*"|[^;]*);')
+
+worker = {}
+
+
+def read_positions(f, offset=0):
+    index = 0
+    for line in f:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        if index >= offset:
+            yield (index, *parse_line(line))
+        index += 1
+
+
+def parse_line(line):
+    # FEN lines carry the two move counters; EPD lines end in operations such
+    # as bm (best moves) and id instead
+    fields = line.split(None, 4)
+    rest = fields[4] if len(fields) > 4 else ""
+    counters = rest.split()
+    if len(counters) == 2 and all(field.isdigit() for field in counters):
+        return " ".join(fields[:4]) + " " + rest, {}
+    operations = {}
+    for key, value in EPD_OPERATION.findall(rest):
+        operations[key] = value.strip().strip('"')
+    return " ".join(fields[:4]) + " 0 1", operations
+
+
+def init_worker(backend, tablebase_dir):
+    worker["logic"] = create_logic(backend)
+    worker["tt"] = TranspositionTable()
+    worker["tablebases"] = Tablebases(tablebase_dir) if tablebase_dir else None
+
+
+def analyze(index, fen, operations, *options):
+    # A position that cannot be read or searched becomes an error record, so
+    # the batch goes on and --resume moves past it
+    try:
+        return search(index, fen, operations, *options)
+    except Exception as e:
+        return {"index": index, "fen": fen, "error": f"{type(e).__name__}: {e}"}
+
+
+def search(index, fen, operations, depth, time_limit, node_limit, seed):
+    logic = worker["logic"]
+    logic.load_fen(fen)
+    start = time.perf_counter()
+    move = find_best_move(
+        logic,
+        depth,
+        tt=worker["tt"],
+        time_limit=time_limit,
+        node_limit=node_limit,
+        rng=random.Random(seed),
+        tablebases=worker["tablebases"],
+    )
+    elapsed = time.perf_counter() - start
+    stats = chess_engine.last_search
+    result = {
+        "index": index,
+        "fen": fen,
+        "move": None,
+        "san": None,
+        "score": stats["score"],
+        "depth": stats["depth"],
+        "nodes": stats["nodes"] + stats["qnodes"],
+        "time": round(elapsed, 4),
+    }
+    if "id" in operations:
+        result["id"] = operations["id"]
+    if move:
+        (r0, c0), (r1, c1) = move
+        promotion = "q" if logic.board[r0][c0][1] == "p" and r1 in (0, 7) else None
+        result["move"] = move_name(move[0], move[1], promotion)
+        result["san"] = logic.san(move[0], move[1], promotion)
+    if "bm" in operations:
+        best = [san.rstrip("+#") for san in operations["bm"].split()]
+        result["solved"] = bool(move) and result["san"].rstrip("+#") in best
+    return result
+
+
+def complete_lines(path):
+    # Counts the finished records of an earlier run and drops a line that was
+    # cut off when that run stopped
+    if not os.path.exists(path):
+        return 0
+    count = 0
+    size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if not line.endswith(b"\n"):
+                break
+            count += 1
+            size += len(line)
+    if size != os.path.getsize(path):
+        with open(path, "r+b") as f:
+            f.truncate(size)
+    return count
+
+
+def run(positions, out, workers, backend, depth, time_limit, node_limit, tb_dir):
+    options = (depth, time_limit, node_limit)
+    done = nodes = solved = tested = failed = 0
+    start = time.perf_counter()
+
+    def write(result):
+        nonlocal done, nodes, solved, tested, failed
+        out.write(json.dumps(result) + "\n")
+        out.flush()
+        done += 1
+        if "error" in result:
+            failed += 1
+            print(f"⚠️ position {result['index']}: {result['error']}")
+            return
+        nodes += result["nodes"]
+        if "solved" in result:
+            tested += 1
+            solved += result["solved"]
+        if done % REPORT_EVERY == 0:
+            report(done, nodes, time.perf_counter() - start)
+
+    if workers > 1:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=init_worker,
+            initargs=(backend, tb_dir),
+        ) as pool:
+            pending = deque()
+            for index, fen, operations in positions:
+                seed = SEED + index
+                pending.append(
+                    pool.submit(analyze, index, fen, operations, *options, seed)
+                )
+                if len(pending) >= workers * IN_FLIGHT:
+                    write(pending.popleft().result())
+            while pending:
+                write(pending.popleft().result())
+    else:
+        init_worker(backend, tb_dir)
+        for index, fen, operations in positions:
+            write(analyze(index, fen, operations, *options, SEED + index))
+
+    elapsed = time.perf_counter() - start
+    report(done, nodes, elapsed)
+    if tested:
+        print(f"✅ {solved}/{tested} best moves found")
+    if failed:
+        print(f"❌ {failed} positions could not be analysed")
+    return done
+
+
+def report(done, nodes, elapsed):
+    print(
+        f"{done} positions, {nodes} nodes in {elapsed:.2f}s "
+        f"({done / elapsed if elapsed else 0:.2f} positions/s, "
+        f"{nodes / elapsed if elapsed else 0:,.0f} nodes/s)"
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Run the engine over an EPD or FEN file and write JSON lines."
+    )
+    parser.add_argument("positions", help="EPD or FEN file, one position per line")
+    parser.add_argument("-o", "--output", default="analysis.jsonl")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--backend", choices=BACKENDS, default="bitboard")
+    parser.add_argument("--depth", type=int, default=DEPTH)
+    parser.add_argument("--time", type=float, help="seconds per position")
+    parser.add_argument("--nodes", type=int, help="node budget per position")
+    parser.add_argument(
+        "--tablebases",
+        nargs="?",
+        const=TABLEBASE_DIR,
+        help="probe tablebases from this directory",
+    )
+    parser.add_argument("--offset", type=int, default=0, help="positions to skip")
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="append to the output, skipping the positions it already holds",
+    )
+    args = parser.parse_args(argv)
+
+    offset = args.offset
+    if args.resume:
+        offset += complete_lines(args.output)
+        if offset:
+            print(f"♻️ Resuming at position {offset}")
+    with open(args.positions, encoding="utf-8") as f, open(
+        args.output, "a" if args.resume else "w", encoding="utf-8"
+    ) as out:
+        run(
+            read_positions(f, offset),
+            out,
+            args.workers,
+            args.backend,
+            args.depth,
+            args.time,
+            args.nodes,
+            args.tablebases,
+        )
+    print(f"✅ Results saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+
+import chess_engine
+from chess_engine import clear_tables, find_best_move
+from chess_logic import BACKENDS, create_logic, move_name
+
+# Positions and depths stay fixed so results can be compared between runs. Each
+# search starts from empty tables with its own seeded RNG, so node counts and
+# chosen moves are reproducible; only the timings depend on the machine.
+POSITIONS = {
+    "italian": (
+        "r1bqkb1r/pppp1ppp/2n2n2/4p3/2B1P3/5N2/PPPP1PPP/RNBQK2R w KQkq - 4 4",
+        3,
+    ),
+    "queens_gambit": (
+        "r1bq1rk1/pp2bppp/2n1pn2/3p4/2PP4/2N1PN2/PP1B1PPP/R2QKB1R w KQ - 0 8",
+        3,
+    ),
+    "kiwipete": (
+        "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+        2,
+    ),
+    "rook_endgame": ("8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1", 5),
+    "pawn_endgame": ("8/8/4k3/8/2K5/3P4/8/8 w - - 0 1", 6),
+    "queen_endgame": ("8/8/8/3k4/8/8/2Q5/3K4 w - - 0 1", 4),
+}
+SEED = 2024
+THRESHOLD = 0.25
+
+
+def bench_position(name, fen, depth, backend="list", seed=SEED, workers=1):
+    logic = create_logic(backend)
+    logic.load_fen(fen)
+    clear_tables()
+    start = time.perf_counter()
+    move = find_best_move(logic, depth, rng=random.Random(seed), workers=workers)
+    elapsed = time.perf_counter() - start
+    stats = chess_engine.last_search
+    nodes = stats["nodes"] + stats["qnodes"]
+    return {
+        "name": name,
+        "fen": fen,
+        "depth": depth,
+        "workers": workers,
+        "move": move_name(*move) if move else None,
+        "score": stats["score"],
+        "nodes": nodes,
+        "time": elapsed,
+        "nps": nodes / elapsed if elapsed else 0.0,
+    }
+
+
+def run(names, backend="list", seed=SEED, depth=None, workers=(1,)):
+    results = []
+    for name in names:
+        fen, default_depth = POSITIONS[name]
+        serial_time = None
+        for count in workers:
+            result = bench_position(
+                name, fen, depth or default_depth, backend, seed, count
+            )
+            line = (
+                f"{name:<14} depth {result['depth']} x{count}: {result['move']} "
+                f"{result['nodes']} nodes in {result['time']:.2f}s "
+                f"({result['nps']:,.0f} nodes/s)"
+            )
+            if count == 1:
+                serial_time = result["time"]
+            elif serial_time:
+                result["speedup"] = serial_time / result["time"]
+                line += f" speedup {result['speedup']:.2f}x"
+            print(line)
+            results.append(result)
+    return {
+        "backend": backend,
+        "seed": seed,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def compare(report, baseline, threshold=THRESHOLD):
+    ok = True
+    previous = {(r["name"], r.get("workers", 1)): r for r in baseline["results"]}
+    for result in report["results"]:
+        label = result["name"]
+        if result["workers"] > 1:
+            label += f" x{result['workers']}"
+        old = previous.get((result["name"], result["workers"]))
+        if old is None or old["depth"] != result["depth"]:
+            print(f"⚠️ {label}: no baseline at depth {result['depth']}")
+            continue
+        problems = []
+        if result["nodes"] > old["nodes"] * (1 + threshold):
+            problems.append(f"nodes {old['nodes']} -> {result['nodes']}")
+        if result["time"] > old["time"] * (1 + threshold):
+            problems.append(f"time {old['time']:.2f}s -> {result['time']:.2f}s")
+        if problems:
+            print(f"❌ {label}: " + ", ".join(problems))
+            ok = False
+        else:
+            print(
+                f"✅ {label}: nodes {old['nodes']} -> {result['nodes']}, "
+                f"time {old['time']:.2f}s -> {result['time']:.2f}s"
+            )
+        if result["move"] != old["move"]:
+            print(f"⚠️ {label}: move {old['move']} -> {result['move']}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark find_best_move on fixed positions."
+    )
+    parser.add_argument("--backend", choices=BACKENDS, default="list")
+    parser.add_argument(
+        "--position",
+        choices=sorted(POSITIONS),
+        action="append",
+        help="position to run (default: all)",
+    )
+    parser.add_argument("--depth", type=int, help="override every position's depth")
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument(
+        "--workers",
+        type=int,
+        nargs="+",
+        default=[1],
+        help="process counts to run each position with, e.g. 1 2 4",
+    )
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against an earlier JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=THRESHOLD,
+        help="allowed growth in nodes or time before a position fails",
+    )
+    args = parser.parse_args(argv)
+
+    report = run(
+        args.position or list(POSITIONS),
+        args.backend,
+        args.seed,
+        args.depth,
+        args.workers,
+    )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"✅ Results saved to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if not compare(report, baseline, args.threshold):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,610 @@
+from chess_logic import (
+    PIECE_VALUE,
+    SCORE_B,
+    SCORE_W,
+    ZOBRIST_BLACK,
+    ZOBRIST_CASTLING,
+    ZOBRIST_EN_PASSANT,
+    ZOBRIST_PIECE,
+    ChessLogic,
+    KING_STEPS,
+    KNIGHT_STEPS,
+    enemy,
+)
+
+BIT = [1 << sq for sq in range(64)]
+FULL = (1 << 64) - 1
+SQUARE = [(sq // 8, sq % 8) for sq in range(64)]
+PIECES = ("wp", "wn", "wb", "wr", "wq", "wk", "bp", "bn", "bb", "br", "bq", "bk")
+# one shared (src, dst) tuple per square pair, so generating a move allocates
+# nothing
+MOVES = [[(SQUARE[a], SQUARE[b]) for b in range(64)] for a in range(64)]
+
+# The position tables of chess_logic indexed by square number
+ZOBRIST = {p: [k for row in ZOBRIST_PIECE[p] for k in row] for p in PIECES}
+SQUARE_SCORE_W = {p: [s for row in SCORE_W[p] for s in row] for p in PIECES}
+SQUARE_SCORE_B = {p: [s for row in SCORE_B[p] for s in row] for p in PIECES}
+
+# Ray directions; a direction is "positive" when it walks towards higher square
+# indexes, which decides whether the nearest blocker is the lowest or highest bit.
+DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1), (-1, 0), (1, 0), (0, -1), (0, 1)]
+DIAGONALS = (0, 1, 2, 3)
+ORTHOGONALS = (4, 5, 6, 7)
+POSITIVE = [dr * 8 + dc > 0 for dr, dc in DIRECTIONS]
+
+
+def _step_table(steps):
+    table = []
+    for r, c in SQUARE:
+        mask = 0
+        for dr, dc in steps:
+            if 0 <= r + dr < 8 and 0 <= c + dc < 8:
+                mask |= BIT[(r + dr) * 8 + c + dc]
+        table.append(mask)
+    return table
+
+
+def _ray_table(dr, dc):
+    table = []
+    for r, c in SQUARE:
+        mask = 0
+        mr, mc = r + dr, c + dc
+        while 0 <= mr < 8 and 0 <= mc < 8:
+            mask |= BIT[mr * 8 + mc]
+            mr += dr
+            mc += dc
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _step_table(KNIGHT_STEPS)
+KING_ATTACKS = _step_table(KING_STEPS)
+PAWN_ATTACKS = {
+    "w": _step_table([(-1, -1), (-1, 1)]),
+    "b": _step_table([(1, -1), (1, 1)]),
+}
+RAYS = [_ray_table(dr, dc) for dr, dc in DIRECTIONS]
+
+
+def lsb(mask):
+    return (mask & -mask).bit_length() - 1
+
+
+def _between_table():
+    # squares strictly between two squares on a common line, 0 for the rest
+    table = [[0] * 64 for _ in range(64)]
+    for a in range(64):
+        for ray in RAYS:
+            mask = ray[a]
+            while mask:
+                bit = mask & -mask
+                mask ^= bit
+                b = bit.bit_length() - 1
+                table[a][b] = ray[a] & ~ray[b] & ~bit
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def slider_attacks(sq, occupied, directions):
+    attacks = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        blockers = ray & occupied
+        if blockers:
+            blocker = lsb(blockers) if POSITIVE[d] else blockers.bit_length() - 1
+            ray ^= RAYS[d][blocker]
+        attacks |= ray
+    return attacks
+
+
+def _relevant_mask(sq, directions):
+    # a blocker on the last square of a ray changes nothing, so it is left out
+    # of the occupancy the attack tables are keyed by
+    mask = 0
+    for d in directions:
+        ray = RAYS[d][sq]
+        if ray:
+            last = ray.bit_length() - 1 if POSITIVE[d] else lsb(ray)
+            mask |= ray ^ BIT[last]
+    return mask
+
+
+# Slider attacks by square and relevant occupancy, filled in on first use
+BISHOP_MASK = [_relevant_mask(sq, DIAGONALS) for sq in range(64)]
+ROOK_MASK = [_relevant_mask(sq, ORTHOGONALS) for sq in range(64)]
+BISHOP_TABLE = [{} for _ in range(64)]
+ROOK_TABLE = [{} for _ in range(64)]
+
+
+def bishop_attacks(sq, occupied):
+    key = occupied & BISHOP_MASK[sq]
+    attacks = BISHOP_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = BISHOP_TABLE[sq][key] = slider_attacks(sq, key, DIAGONALS)
+    return attacks
+
+
+def rook_attacks(sq, occupied):
+    key = occupied & ROOK_MASK[sq]
+    attacks = ROOK_TABLE[sq].get(key)
+    if attacks is None:
+        attacks = ROOK_TABLE[sq][key] = slider_attacks(sq, key, ORTHOGONALS)
+    return attacks
+
+
+class BitboardLogic(ChessLogic):
+    backend = "bitboard"
+
+    # The list board is kept as well, as the square-to-piece lookup the rest of
+    # the program reads; make_move and unmake_move update both in one pass.
+    def refresh(self):
+        super().refresh()
+        self.sync_bitboards()
+
+    def sync_bitboards(self):
+        self.pieces = dict.fromkeys(PIECES, 0)
+        self.occupancy = {"w": 0, "b": 0}
+        for sq, (r, c) in enumerate(SQUARE):
+            p = self.board[r][c]
+            if p:
+                self.pieces[p] |= BIT[sq]
+                self.occupancy[p[0]] |= BIT[sq]
+
+    def attack_mask(self, sq, attack_color, occupied):
+        pieces = self.pieces
+        queens = pieces[attack_color + "q"]
+        return (
+            PAWN_ATTACKS[enemy(attack_color)][sq] & pieces[attack_color + "p"]
+            | KNIGHT_ATTACKS[sq] & pieces[attack_color + "n"]
+            | KING_ATTACKS[sq] & pieces[attack_color + "k"]
+            | bishop_attacks(sq, occupied) & (pieces[attack_color + "b"] | queens)
+            | rook_attacks(sq, occupied) & (pieces[attack_color + "r"] | queens)
+        )
+
+    def attackers(self, target_r, target_c, attack_color, first=False):
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        mask = self.attack_mask(target_r * 8 + target_c, attack_color, occupied)
+        found = []
+        while mask:
+            bit = mask & -mask
+            found.append(SQUARE[bit.bit_length() - 1])
+            if first:
+                break
+            mask ^= bit
+        return found
+
+    def is_square_attacked(self, target_r, target_c, attack_color):
+        sq = target_r * 8 + target_c
+        pieces = self.pieces
+        if KNIGHT_ATTACKS[sq] & pieces[attack_color + "n"]:
+            return True
+        if KING_ATTACKS[sq] & pieces[attack_color + "k"]:
+            return True
+        if PAWN_ATTACKS[enemy(attack_color)][sq] & pieces[attack_color + "p"]:
+            return True
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        queens = pieces[attack_color + "q"]
+        diagonal = pieces[attack_color + "b"] | queens
+        if diagonal and bishop_attacks(sq, occupied) & diagonal:
+            return True
+        orthogonal = pieces[attack_color + "r"] | queens
+        if orthogonal and rook_attacks(sq, occupied) & orthogonal:
+            return True
+        return False
+
+    def is_in_check(self, color):
+        kings = self.pieces[color + "k"]
+        if not kings:
+            return True
+        r, c = SQUARE[lsb(kings)]
+        return self.is_square_attacked(r, c, enemy(color))
+
+    def cheapest_attacker(self, sq, attack_color, occupied):
+        # the attackers of the cheapest attacking type among the pieces still in
+        # occupied, so x-rays open as pieces are taken off
+        pieces = self.pieces
+        found = PAWN_ATTACKS[enemy(attack_color)][sq] & pieces[attack_color + "p"]
+        if found & occupied:
+            return found & occupied, "p"
+        found = KNIGHT_ATTACKS[sq] & pieces[attack_color + "n"] & occupied
+        if found:
+            return found, "n"
+        diagonal = bishop_attacks(sq, occupied) & occupied
+        found = diagonal & pieces[attack_color + "b"]
+        if found:
+            return found, "b"
+        orthogonal = rook_attacks(sq, occupied) & occupied
+        found = orthogonal & pieces[attack_color + "r"]
+        if found:
+            return found, "r"
+        found = (diagonal | orthogonal) & pieces[attack_color + "q"]
+        if found:
+            return found, "q"
+        found = KING_ATTACKS[sq] & pieces[attack_color + "k"] & occupied
+        if found:
+            return found, "k"
+        return 0, None
+
+    def static_exchange(self, src, dst):
+        board = self.board
+        r1, c1 = dst
+        sq = r1 * 8 + c1
+        piece = board[src[0]][src[1]]
+        color = piece[0]
+        occupied = (self.occupancy["w"] | self.occupancy["b"]) ^ BIT[
+            src[0] * 8 + src[1]
+        ]
+        victim = board[r1][c1]
+        if not victim and piece[1] == "p" and src[1] != c1:
+            victim = enemy(color) + "p"
+            occupied ^= BIT[src[0] * 8 + c1]
+
+        gains = [PIECE_VALUE[victim[1]] if victim else 0]
+        on_square = piece[1]
+        side = enemy(color)
+        while True:
+            found, capturer = self.cheapest_attacker(sq, side, occupied)
+            if not found:
+                break
+            occupied ^= found & -found
+            if capturer == "k":
+                if self.cheapest_attacker(sq, enemy(side), occupied)[0]:
+                    break
+            gains.append(PIECE_VALUE[on_square] - gains[-1])
+            on_square = capturer
+            side = enemy(side)
+
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def potential_moves(self, pr, pc, ignore_castle=False):
+        p = self.board[pr][pc]
+        if not p:
+            return []
+
+        color, type = p[0], p[1]
+        sq = pr * 8 + pc
+        own = self.occupancy[color]
+        occupied = own | self.occupancy[enemy(color)]
+
+        if type == "p":
+            moves = []
+            step = -1 if color == "w" else 1
+            start = 6 if color == "w" else 1
+            if not occupied & BIT[sq + step * 8]:
+                moves.append((pr + step, pc))
+                if pr == start and not occupied & BIT[sq + step * 16]:
+                    moves.append((pr + 2 * step, pc))
+            targets = PAWN_ATTACKS[color][sq] & self.occupancy[enemy(color)]
+            while targets:
+                bit = targets & -targets
+                moves.append(SQUARE[bit.bit_length() - 1])
+                targets ^= bit
+            if self.en_passant:
+                er, ec = self.en_passant
+                if pr + step == er and abs(ec - pc) == 1:
+                    moves.append((er, ec))
+            return moves
+
+        if type == "n":
+            targets = KNIGHT_ATTACKS[sq] & ~own
+        elif type == "b":
+            targets = bishop_attacks(sq, occupied) & ~own
+        elif type == "r":
+            targets = rook_attacks(sq, occupied) & ~own
+        elif type == "q":
+            targets = (bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)) & ~own
+        else:
+            targets = KING_ATTACKS[sq] & ~own
+
+        moves = []
+        while targets:
+            bit = targets & -targets
+            moves.append(SQUARE[bit.bit_length() - 1])
+            targets ^= bit
+        if type == "k" and not ignore_castle:
+            moves += self.castling_moves(color)
+        return moves
+
+    def castling_moves(self, color):
+        moves = []
+        if self.is_in_check(color):
+            return moves
+        row_home = 7 if color == "w" else 0
+        occupied = self.occupancy["w"] | self.occupancy["b"]
+        base = row_home * 8
+        if (
+            not self.defined_castling[f"{color}R7"]
+            and not occupied & (BIT[base + 5] | BIT[base + 6])
+            and not self.is_square_attacked(row_home, 5, enemy(color))
+        ):
+            moves.append((row_home, 6))
+        if (
+            not self.defined_castling[f"{color}R0"]
+            and not occupied & (BIT[base + 1] | BIT[base + 2] | BIT[base + 3])
+            and not self.is_square_attacked(row_home, 3, enemy(color))
+        ):
+            moves.append((row_home, 2))
+        return moves
+
+    def pin_masks(self, king_sq, color, occupied):
+        # pinned square -> the squares it may still move to: the ray between
+        # the king and the pinning piece, that piece included
+        them = enemy(color)
+        pieces = self.pieces
+        theirs = self.occupancy[them]
+        queens = pieces[them + "q"]
+        snipers = rook_attacks(king_sq, theirs) & (pieces[them + "r"] | queens)
+        snipers |= bishop_attacks(king_sq, theirs) & (pieces[them + "b"] | queens)
+        own = self.occupancy[color]
+        pins = {}
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            between = BETWEEN[king_sq][bit.bit_length() - 1]
+            blockers = between & occupied
+            if blockers & own and not blockers & (blockers - 1):
+                pins[blockers.bit_length() - 1] = between | bit
+        return pins
+
+    def get_legal_moves(self, color, captures_only=False):
+        king = self.kings[color]
+        if king is None:
+            return []
+        board = self.board
+        them = enemy(color)
+        own = self.occupancy[color]
+        theirs = self.occupancy[them]
+        occupied = own | theirs
+        king_sq = king[0] * 8 + king[1]
+        targets = theirs if captures_only else FULL ^ own
+
+        checkers = self.attack_mask(king_sq, them, occupied)
+        if checkers & (checkers - 1):
+            evasions = 0
+        elif checkers:
+            evasions = checkers | BETWEEN[king_sq][lsb(checkers)]
+        else:
+            evasions = FULL
+        pins = self.pin_masks(king_sq, color, occupied)
+        en_passant = self.en_passant
+        ep_bit = BIT[en_passant[0] * 8 + en_passant[1]] if en_passant else 0
+        if color == "w":
+            step, start_row, last_row = -8, 6, 0
+        else:
+            step, start_row, last_row = 8, 1, 7
+
+        legal = []
+        pieces = own
+        while pieces:
+            bit = pieces & -pieces
+            pieces ^= bit
+            sq = bit.bit_length() - 1
+            r, c = SQUARE[sq]
+            moving = MOVES[sq]
+            type = board[r][c][1]
+
+            if type == "k":
+                # the king leaves its square, so sliders see through it
+                found = KING_ATTACKS[sq] & targets
+                without_king = occupied ^ bit
+                while found:
+                    to = found & -found
+                    found ^= to
+                    dst = to.bit_length() - 1
+                    if not self.attack_mask(dst, them, without_king):
+                        legal.append(moving[dst])
+                if not captures_only and not checkers:
+                    for dst in self.castling_moves(color):
+                        undo = self.make_move((r, c), dst)
+                        if not self.is_in_check(color):
+                            legal.append(((r, c), dst))
+                        self.unmake_move(undo)
+                continue
+
+            allowed = evasions & pins[sq] if sq in pins else evasions
+            if type == "p":
+                push = sq + step
+                if not occupied & BIT[push]:
+                    if allowed & BIT[push] and (
+                        not captures_only or push // 8 == last_row
+                    ):
+                        legal.append(moving[push])
+                    if r == start_row and not captures_only:
+                        double = push + step
+                        if not occupied & BIT[double] and allowed & BIT[double]:
+                            legal.append(moving[double])
+                found = PAWN_ATTACKS[color][sq] & theirs & allowed
+                while found:
+                    to = found & -found
+                    found ^= to
+                    legal.append(moving[to.bit_length() - 1])
+                if PAWN_ATTACKS[color][sq] & ep_bit:
+                    # taking en passant empties two squares on the capturing
+                    # rank, so it is checked by playing it
+                    undo = self.make_move((r, c), en_passant)
+                    if not self.is_in_check(color):
+                        legal.append(((r, c), en_passant))
+                    self.unmake_move(undo)
+                continue
+
+            if not allowed:
+                continue
+            if type == "n":
+                found = KNIGHT_ATTACKS[sq]
+            elif type == "b":
+                found = bishop_attacks(sq, occupied)
+            elif type == "r":
+                found = rook_attacks(sq, occupied)
+            else:
+                found = bishop_attacks(sq, occupied) | rook_attacks(sq, occupied)
+            found &= targets & allowed
+            while found:
+                to = found & -found
+                found ^= to
+                legal.append(moving[to.bit_length() - 1])
+        return legal
+
+    def make_move(self, src, dst, promotion_callback=None):
+        r0, c0 = src
+        r1, c1 = dst
+        from_sq = r0 * 8 + c0
+        to_sq = r1 * 8 + c1
+        board = self.board
+        pieces = self.pieces
+        occupancy = self.occupancy
+        piece = board[r0][c0]
+        color = piece[0]
+        type = piece[1]
+
+        captured = board[r1][c1]
+        capture_sq = dst
+        castling = None
+        rook_move = None
+        promoted = None
+        en_passant = self.en_passant
+        old_state = (self.hash, self.pawn_hash, self.score_w, self.score_b)
+        h = self.hash ^ ZOBRIST_BLACK ^ ZOBRIST[piece][from_sq]
+        pawn_hash = self.pawn_hash
+        score_w = self.score_w - SQUARE_SCORE_W[piece][from_sq]
+        score_b = self.score_b - SQUARE_SCORE_B[piece][from_sq]
+        if en_passant:
+            h ^= ZOBRIST_EN_PASSANT[en_passant[1]]
+
+        if type == "k" or type == "r":
+            castling = self.defined_castling.copy()
+            if type == "k":
+                self.defined_castling[f"{color}R0"] = True
+                self.defined_castling[f"{color}R7"] = True
+            elif c0 == 0:
+                self.defined_castling[f"{color}R0"] = True
+            elif c0 == 7:
+                self.defined_castling[f"{color}R7"] = True
+            for key, moved in castling.items():
+                if moved != self.defined_castling[key]:
+                    h ^= ZOBRIST_CASTLING[key]
+
+        self.en_passant = None
+        if type == "p":
+            pawn_hash ^= ZOBRIST[piece][from_sq]
+            if c0 != c1 and not captured:
+                capture_sq = (r0, c1)
+                captured = board[r0][c1]
+                board[r0][c1] = ""
+            if r1 - r0 == 2 or r0 - r1 == 2:
+                self.en_passant = ((r0 + r1) // 2, c0)
+                h ^= ZOBRIST_EN_PASSANT[c0]
+        if captured:
+            cut = capture_sq[0] * 8 + capture_sq[1]
+            self.piece_count -= 1
+            h ^= ZOBRIST[captured][cut]
+            score_w -= SQUARE_SCORE_W[captured][cut]
+            score_b -= SQUARE_SCORE_B[captured][cut]
+            pieces[captured] ^= BIT[cut]
+            occupancy[captured[0]] ^= BIT[cut]
+            if captured[1] == "p":
+                pawn_hash ^= ZOBRIST[captured][cut]
+            elif captured[1] == "k":
+                self.kings[captured[0]] = None
+
+        if type == "k" and (c1 - c0 == 2 or c0 - c1 == 2):
+            rook_c0, rook_c1 = (7, 5) if c1 > c0 else (0, 3)
+            rook = board[r1][rook_c0]
+            rook_move = (r1, rook_c0, rook_c1, rook)
+            board[r1][rook_c1] = rook
+            board[r1][rook_c0] = ""
+            if rook:
+                rook_from = r1 * 8 + rook_c0
+                rook_to = r1 * 8 + rook_c1
+                h ^= ZOBRIST[rook][rook_from] ^ ZOBRIST[rook][rook_to]
+                score_w += (
+                    SQUARE_SCORE_W[rook][rook_to] - SQUARE_SCORE_W[rook][rook_from]
+                )
+                score_b += (
+                    SQUARE_SCORE_B[rook][rook_to] - SQUARE_SCORE_B[rook][rook_from]
+                )
+                rook_bits = BIT[rook_from] | BIT[rook_to]
+                pieces[rook] ^= rook_bits
+                occupancy[rook[0]] ^= rook_bits
+
+        if type == "p" and (r1 == 0 or r1 == 7):
+            promote = None
+            if promotion_callback:
+                promote = promotion_callback(color)
+            if not promote:
+                promote = "q"
+            promoted = color + promote
+            placed = promoted
+        else:
+            placed = piece
+            if type == "p":
+                pawn_hash ^= ZOBRIST[piece][to_sq]
+            elif type == "k":
+                self.kings[color] = dst
+        board[r1][c1] = placed
+        h ^= ZOBRIST[placed][to_sq]
+        score_w += SQUARE_SCORE_W[placed][to_sq]
+        score_b += SQUARE_SCORE_B[placed][to_sq]
+        pieces[piece] ^= BIT[from_sq]
+        pieces[placed] ^= BIT[to_sq]
+        occupancy[color] ^= BIT[from_sq] | BIT[to_sq]
+
+        board[r0][c0] = ""
+        self.turn = enemy(self.turn)
+        self.hash = h
+        self.pawn_hash = pawn_hash
+        self.score_w = score_w
+        self.score_b = score_b
+        return (
+            src,
+            dst,
+            piece,
+            captured,
+            capture_sq,
+            en_passant,
+            castling,
+            rook_move,
+            promoted,
+            old_state,
+        )
+
+    def unmake_move(self, undo):
+        src, dst, piece, captured, capture_sq = undo[:5]
+        en_passant, castling, rook_move, promoted = undo[5:9]
+        board = self.board
+        pieces = self.pieces
+        occupancy = self.occupancy
+        color = piece[0]
+        from_bit = BIT[src[0] * 8 + src[1]]
+        to_bit = BIT[dst[0] * 8 + dst[1]]
+        board[src[0]][src[1]] = piece
+        board[dst[0]][dst[1]] = ""
+        board[capture_sq[0]][capture_sq[1]] = captured
+        pieces[piece] ^= from_bit
+        pieces[promoted or piece] ^= to_bit
+        occupancy[color] ^= from_bit | to_bit
+        if rook_move:
+            r, rook_c0, rook_c1, rook = rook_move
+            board[r][rook_c1] = ""
+            board[r][rook_c0] = rook
+            if rook:
+                rook_bits = BIT[r * 8 + rook_c0] | BIT[r * 8 + rook_c1]
+                pieces[rook] ^= rook_bits
+                occupancy[rook[0]] ^= rook_bits
+        if castling is not None:
+            self.defined_castling = castling
+        self.en_passant = en_passant
+        self.turn = enemy(self.turn)
+        self.hash, self.pawn_hash, self.score_w, self.score_b = undo[9]
+        if piece[1] == "k":
+            self.kings[color] = src
+        if captured:
+            capture_bit = BIT[capture_sq[0] * 8 + capture_sq[1]]
+            pieces[captured] ^= capture_bit
+            occupancy[captured[0]] ^= capture_bit
+            self.piece_count += 1
+            if captured[1] == "k":
+                self.kings[captured[0]] = capture_sq
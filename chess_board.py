@@ -1,9 +1,15 @@
 from PIL import Image, ImageTk
 import tkinter as tk
 import time
-import json
-from chess_logic import ChessLogic, SYM, START_BOARD
-from chess_engine import find_best_move, find_random_move, ai_stop
+import os
+import queue
+import threading
+from chess_logic import create_logic, SYM, START_BOARD
+from chess_engine import find_best_move, find_random_move, MAX_DEPTH
+from chess_engine import Ponder, last_search
+from chess_book import OpeningBook
+from chess_tablebase import Tablebases, TABLEBASE_DIR
+from chess_journal import Journal, JOURNAL_PATH, convert
 
 LIGHT_SQUARE = "#F3E7CF"
 DARK_SQUARE = "#E09F3E"
@@ -13,143 +19,170 @@ WRONG_HIGHLIGHT = "#CC00FF"
 CHECK = "#FF545A"
 CELL_SIZE = 35
 FONT_SIZE = 20
+LOGIC_BACKEND = "bitboard"
+AI_TIME_LIMIT = 1.5
+AI_WORKERS = 1
+AI_PONDER = True
+AI_POLL_MS = 20
+BOOK_PATH = "chess_book.bin"
+LEGACY_SAVE_PATH = "chess_save.json"
+BAD_SAVE_PATH = JOURNAL_PATH + ".bad"
 
 flipped = False
 dragging = False
 selected = None
 last_move = None
-ai_from = None
-ai_to = None
+board_flipped = False
+board_images = {}
+bg_item = None
+square_items = {}
+square_looks = {}
+EMPTY_LOOK = (False, False, None, "")
 ai_continue = False
 ai_doing = False
+ai_thread = None
+ai_cancel = threading.Event()
 do_progression = False
 promotion_frame = None
 promotion_buttons = []
 highlight = []
 wrong_hint_squares = []
-logic = ChessLogic()
-
-
-def save_game(filename="chess_save.json"):
-    def compress_board(board):
-        return [" ".join(cell if cell else "__" for cell in row) for row in board]
-
-    compact_history = []
-    for state in logic.history:
-        compact_history.append(
-            {
-                "board": compress_board(state["board"]),
-                "turn": state["turn"],
-                "has_moved": state["has_moved"],
-                "en_passant": state["en_passant"],
-                "last_move": state["last_move"],
-            }
-        )
+logic = create_logic(LOGIC_BACKEND)
+ponder = Ponder()
+book = OpeningBook(BOOK_PATH) if os.path.exists(BOOK_PATH) else None
+tablebases = Tablebases(TABLEBASE_DIR)
+journal = Journal(JOURNAL_PATH)
+
 
-    with open(filename, "w", encoding="utf-8") as f:
-        json.dump(compact_history, f, ensure_ascii=False, indent=2)
-    print("✅ Game saved to", filename)
+def save_game():
+    journal.record(logic)
 
 
-def load_game(filename="chess_save.json"):
+def load_game():
     global logic
     try:
-        with open(filename, "r", encoding="utf-8") as f:
-            history = json.load(f)
-
-        def expand_board(board_lines):
-            return [
-                [cell if cell != "__" else "" for cell in row.split(" ")]
-                for row in board_lines
-            ]
-
-        expanded_history = []
-        for state in history:
-            expanded_history.append(
-                {
-                    "board": expand_board(state["board"]),
-                    "turn": state["turn"],
-                    "has_moved": state["has_moved"],
-                    "en_passant": state["en_passant"],
-                    "last_move": state["last_move"],
-                }
-            )
-
-        logic.history = expanded_history
-        logic.history_index = len(expanded_history) - 1
-        print(logic.history_index)
-        logic.restore(expanded_history[-1])
+        if not os.path.exists(JOURNAL_PATH) and os.path.exists(LEGACY_SAVE_PATH):
+            convert(LEGACY_SAVE_PATH, JOURNAL_PATH, LOGIC_BACKEND)
+            print("♻️ Converted", LEGACY_SAVE_PATH, "to", JOURNAL_PATH)
+        logic = journal.load(LOGIC_BACKEND)
         print("♻️ Game loaded successfully")
     except Exception as e:
         print("⚠️ Failed to load game:", e)
-        logic.board = START_BOARD
+        if os.path.exists(JOURNAL_PATH):
+            os.replace(JOURNAL_PATH, BAD_SAVE_PATH)
+            print("⚠️ Unreadable save kept as", BAD_SAVE_PATH)
+        logic = create_logic(LOGIC_BACKEND)
+        journal.compact(logic)
     draw_board()
 
 
-def draw_board(clear=False):
-    global flipped, last_move
-    canva.delete("all")
-    bg_image = Image.open(
-        "image/chessboard_clean2.png" if flipped else "image/chessboard_clean.png"
-    )
-    bg_photo = ImageTk.PhotoImage(bg_image)
-    canva.create_image(0, 0, image=bg_photo, anchor="nw")
-    canva.bg_photo = bg_photo  # type: ignore
-
-    if clear:
-        return
+def create_board_items():
+    # Every square keeps its own canvas items for the check tint, last-move
+    # tint, highlight and piece; draw_board only reconfigures the ones whose
+    # look changed since the previous draw.
+    global bg_item
+    for name in (False, True):
+        image = Image.open(
+            "image/chessboard_clean2.png" if name else "image/chessboard_clean.png"
+        )
+        board_images[name] = ImageTk.PhotoImage(image)
+    bg_item = canva.create_image(0, 0, image=board_images[False], anchor="nw")
 
     for r in range(8):
         for c in range(8):
-            white_r = 7 - r if flipped else r
-            white_c = 7 - c if flipped else c
-            piece = logic.board[white_r][white_c]
-
             x0 = (c + 1) * CELL_SIZE
             y0 = (r + 1) * CELL_SIZE
             x1 = (c + 2) * CELL_SIZE
             y1 = (r + 2) * CELL_SIZE
+            check = canva.create_rectangle(
+                x0, y0, x1, y1, fill=CHECK, outline="", state="hidden"
+            )
+            last = canva.create_rectangle(
+                x0,
+                y0,
+                x1,
+                y1,
+                fill="#777777",
+                stipple="gray50",
+                outline="",
+                state="hidden",
+            )
+            mark = canva.create_rectangle(
+                x0, y0, x1, y1, stipple="gray50", outline="", state="hidden"
+            )
+            glyph = canva.create_text(
+                (c + 1.5) * CELL_SIZE - 1,
+                (r + 1.5) * CELL_SIZE - 2,
+                text="",
+                font=("Segoe UI Symbol", FONT_SIZE),
+                state="hidden",
+            )
+            square_items[(r, c)] = (check, last, mark, glyph)
+            square_looks[(r, c)] = EMPTY_LOOK
+
 
-            if (
-                piece
-                and piece[1] == "k"
-                and logic.is_in_check(piece[0])
-                and not (white_r, white_c) == selected
-                and not (white_r, white_c) in wrong_hint_squares
-            ):
-                canva.create_rectangle(x0, y0, x1, y1, fill=CHECK, outline="")
-
-            if last_move:
-                ((from_r, from_c), (to_r, to_c)) = last_move  # type: ignore
-                if (white_r, white_c) == (from_r, from_c) or (white_r, white_c) == (
-                    to_r,
-                    to_c,
-                ):
-                    canva.create_rectangle(
-                        x0, y0, x1, y1, fill="#777777", stipple="gray50", outline=""
-                    )
-
-            if selected and (white_r, white_c) == selected:
-                canva.create_rectangle(
-                    x0, y0, x1, y1, fill=PICK_HIGHLIGHT, stipple="gray50", outline=""
-                )
-            elif (white_r, white_c) in highlight:
-                canva.create_rectangle(
-                    x0, y0, x1, y1, fill=LEGAL_HIGHLIGHT, stipple="gray50", outline=""
-                )
-            elif (white_r, white_c) in wrong_hint_squares:
-                canva.create_rectangle(
-                    x0, y0, x1, y1, fill=WRONG_HIGHLIGHT, stipple="gray50", outline=""
-                )
-
-            if piece:
-                canva.create_text(
-                    (c + 1.5) * CELL_SIZE - 1,
-                    (r + 1.5) * CELL_SIZE - 2,
-                    text=SYM[piece],
-                    font=("Segoe UI Symbol", FONT_SIZE),
-                    fill="#222222" if piece.startswith("w") else "#111111",
-                )
+def square_look(white_r, white_c):
+    piece = logic.board[white_r][white_c]
+    square = (white_r, white_c)
+    check = bool(
+        piece
+        and piece[1] == "k"
+        and logic.in_check(piece[0])
+        and not square == selected
+        and not square in wrong_hint_squares
+    )
+    last = bool(last_move and square in map(tuple, last_move))
+    if selected and square == selected:
+        mark = PICK_HIGHLIGHT
+    elif square in highlight:
+        mark = LEGAL_HIGHLIGHT
+    elif square in wrong_hint_squares:
+        mark = WRONG_HIGHLIGHT
+    else:
+        mark = None
+    return check, last, mark, piece
+
+
+def update_square(square, look):
+    old = square_looks[square]
+    check, last, mark, glyph = square_items[square]
+    if look[0] != old[0]:
+        canva.itemconfigure(check, state="normal" if look[0] else "hidden")
+    if look[1] != old[1]:
+        canva.itemconfigure(last, state="normal" if look[1] else "hidden")
+    if look[2] != old[2]:
+        if look[2]:
+            canva.itemconfigure(mark, state="normal", fill=look[2])
+        else:
+            canva.itemconfigure(mark, state="hidden")
+    if look[3] != old[3]:
+        piece = look[3]
+        if piece:
+            canva.itemconfigure(
+                glyph,
+                state="normal",
+                text=SYM[piece],
+                fill="#222222" if piece.startswith("w") else "#111111",
+            )
+        else:
+            canva.itemconfigure(glyph, state="hidden")
+    square_looks[square] = look
+
+
+def draw_board(clear=False):
+    global board_flipped
+    canva.delete("ai_think")
+    if board_flipped != flipped:
+        canva.itemconfigure(bg_item, image=board_images[flipped])
+        board_flipped = flipped
+
+    for r in range(8):
+        for c in range(8):
+            white_r = 7 - r if flipped else r
+            white_c = 7 - c if flipped else c
+            look = EMPTY_LOOK if clear else square_look(white_r, white_c)
+            if look != square_looks[(r, c)]:
+                update_square((r, c), look)
 
 
 def on_click(event):
@@ -172,7 +205,7 @@ def on_click(event):
     piece = logic.board[white_r][white_c]
     pos = (white_r, white_c)
 
-    legal_moves = logic.get_legal_moves(logic.turn)
+    legal_moves = logic.legal_moves()
 
     hide_promotion_buttons()
     if selected and ((selected, pos) in legal_moves):
@@ -183,7 +216,8 @@ def on_click(event):
             return selected_piece.get()
 
         logic.do_move(selected, pos, promotion_callback)
-        last_move = logic.restore(logic.history[logic.history_index])
+        ponder.follow(logic)
+        last_move = logic.last_move()
         save_game()
 
         selected = None
@@ -223,13 +257,7 @@ def draw_ai_think(move):
     if move is None:
         return
 
-    global ai_from, ai_to, ai_doing
-    if ai_to:
-        canva.delete(ai_to)
-        ai_to = None
-    if ai_from:
-        canva.delete(ai_from)
-        ai_from = None
+    canva.delete("ai_think")
 
     (r0, c0), (r1, c1) = move
     if flipped:
@@ -254,26 +282,51 @@ def draw_ai_think(move):
             CELL_SIZE * 9,
             outline="#EBEB26",
             width=4,
+            tags="ai_think",
         )
 
-    ai_to = canva.create_rectangle(tx0, ty0, tx1, ty1, outline="#3371E5", width=4)
-    ai_from = canva.create_rectangle(fx0, fy0, fx1, fy1, outline="#74E533", width=4)
-    root.update()
+    canva.create_rectangle(
+        tx0, ty0, tx1, ty1, outline="#3371E5", width=4, tags="ai_think"
+    )
+    canva.create_rectangle(
+        fx0, fy0, fx1, fy1, outline="#74E533", width=4, tags="ai_think"
+    )
 
 
 def ai_move_continue():
-    global ai_continue, ai_stop, ai_doing
+    global ai_continue
     ai_continue = not ai_continue
     if ai_continue:
         ai_move()
     else:
-        ai_stop = True
+        stop_ai()
+
+
+def ai_search(search, cancel, messages):
+    # runs in the worker thread on a copy of the game; only talks to Tk through
+    # the queue, which poll_ai drains on the main thread
+    mv = ponder.finish(search, AI_TIME_LIMIT)
+    if mv is None and not cancel.is_set():
+        mv = find_best_move(
+            search,
+            MAX_DEPTH,
+            callback=lambda move: messages.put(("think", move)),
+            time_limit=AI_TIME_LIMIT,
+            workers=AI_WORKERS,
+            stop=cancel,
+            book=book,
+            tablebases=tablebases,
+        )
+    messages.put(("done", mv, last_search.get("ponder_move")))
 
 
 def ai_move():
-    global logic, selected, highlight, wrong_hint_squares, ai_continue, do_progression, ai_doing, ai_stop, last_move
+    global selected, highlight, wrong_hint_squares, do_progression, ai_doing, ai_thread, ai_cancel, ai_continue
     if ai_doing:
         return
+    if logic.game_state():
+        ai_continue = False
+        return
 
     ai_doing = True
     do_progression = False
@@ -281,31 +334,70 @@ def ai_move():
     highlight = []
     wrong_hint_squares = []
     draw_board()
-    mv = find_best_move(logic, 3, callback=draw_ai_think)
+    ai_cancel = threading.Event()
+    messages = queue.Queue()
+    ai_thread = threading.Thread(
+        target=ai_search, args=(logic.copy(), ai_cancel, messages), daemon=True
+    )
+    ai_thread.start()
+    root.after(AI_POLL_MS, poll_ai, ai_cancel, messages)
+
+
+def poll_ai(cancel, messages):
+    global ai_continue, ai_doing, ai_thread, last_move
+    if cancel.is_set():
+        return
+
+    while True:
+        try:
+            message = messages.get_nowait()
+        except queue.Empty:
+            root.after(AI_POLL_MS, poll_ai, cancel, messages)
+            return
+        if message[0] == "think":
+            draw_ai_think(message[1])
+        else:
+            break
+
+    _, mv, reply = message
+    ai_doing = False
+    ai_thread = None
     if mv:
         logic.do_move(*mv)
-        last_move = logic.restore(logic.history[logic.history_index])
+        last_move = logic.last_move()
         save_game()
         draw_board()
         if ai_continue:
             root.after(0, ai_move)
+        elif AI_PONDER:
+            ponder.start(logic, reply, book=book, tablebases=tablebases)
     else:
         ai_continue = False
+        draw_board()
 
-    ai_doing = False
+
+def stop_ai():
+    global ai_doing, ai_thread
+    ai_cancel.set()
+    ponder.cancel()
+    if ai_thread:
+        ai_thread.join()
+        ai_thread = None
+    if ai_doing:
+        ai_doing = False
+        draw_board()
 
 
 def reset_board():
-    global logic, selected, highlight, wrong_hint_squares, ai_stop, do_progression, last_move, ai_doing
-    if ai_doing:
-        return
+    global logic, selected, highlight, wrong_hint_squares, do_progression, last_move, ai_continue
+    ai_continue = False
+    stop_ai()
 
     if logic.board == START_BOARD:
         draw_board(True)
         root.update()
         time.sleep(0.001)
-    logic = ChessLogic()
-    ai_stop = True
+    logic = create_logic(LOGIC_BACKEND)
     do_progression = False
     selected = None
     last_move = None
@@ -336,20 +428,21 @@ def random_move():
     mv = find_random_move(logic)
     if mv:
         logic.do_move(*mv)
-        last_move = logic.restore(logic.history[logic.history_index])
+        ponder.follow(logic)
+        last_move = logic.last_move()
         save_game()
         draw_board()
 
 
 def undo_move():
-    global selected, highlight, wrong_hint_squares, do_progression, ai_doing, last_move
-    if ai_doing:
-        return
+    global selected, highlight, wrong_hint_squares, do_progression, last_move, ai_continue
+    ai_continue = False
+    stop_ai()
 
     do_progression = False
     logic.undo()
     selected = None
-    last_move = logic.restore(logic.history[logic.history_index])
+    last_move = logic.last_move()
     highlight = []
     wrong_hint_squares = []
     draw_board()
@@ -361,9 +454,10 @@ def forward_move():
         return
 
     do_progression = False
+    ponder.cancel()
     logic.forward()
     selected = None
-    last_move = logic.restore(logic.history[logic.history_index])
+    last_move = logic.last_move()
     highlight = []
     wrong_hint_squares = []
     draw_board()
@@ -381,23 +475,22 @@ def progression():
         time.sleep(0.001)
 
     do_progression = True
+    ponder.cancel()
     selected = None
     highlight = []
     wrong_hint_squares = []
     print(logic.history_index, len(logic.history))
     if logic.history_index >= len(logic.history) - 1:
-        logic.history_index = 0
+        logic.seek(0)
 
-    while logic.history_index < len(logic.history):
-        logic.restore(logic.history[logic.history_index])
-        last_move = logic.restore(logic.history[logic.history_index])
+    while True:
+        last_move = logic.last_move()
         draw_board()
         root.update()
         time.sleep(0.1)
-        logic.history_index += 1
-        if not do_progression:
+        if not do_progression or logic.history_index >= len(logic.history) - 1:
             break
-    logic.history_index -= 1
+        logic.forward()
     do_progression = False
 
 
@@ -453,6 +546,7 @@ canva = tk.Canvas(
     root, width=CELL_SIZE * 10, height=CELL_SIZE * 10, highlightthickness=0
 )
 canva.pack()
+create_board_items()
 
 selected_piece = tk.StringVar()
 load_game()
@@ -477,3 +571,4 @@ root.bind("<f>", lambda e: forward_move())
 root.bind("<g>", lambda e: progression())
 
 root.mainloop()
+journal.close()
@@ -0,0 +1,175 @@
+import argparse
+import mmap
+import os
+import random
+import re
+import struct
+import sys
+from collections import Counter
+
+from chess_logic import ChessLogic, move_name
+from chess_pgn import RESULTS, movetext_tokens, play, read_games as read_pgn
+
+# File layout: an 8-byte magic and the entry count, then fixed-size entries
+# sorted by key. Keys are ChessLogic.hash values, whose Zobrist tables are
+# seeded, so a book stays valid between runs. A move packs the from square,
+# to square and promotion piece into 16 bits.
+MAGIC = b"CHSBOOK1"
+HEADER = struct.Struct(">8sQ")
+ENTRY = struct.Struct(">QHH")
+PROMOTIONS = ("", "n", "b", "r", "q")
+BOOK_PLIES = 20
+MAX_WEIGHT = 0xFFFF
+# "#" starts a comment at the start of a line or after a space; anywhere else
+# it is the mate sign of a SAN move
+COMMENT = re.compile(r"(^|\s)#.*")
+
+
+def encode_move(src, dst, promotion=None):
+    code = (src[0] * 8 + src[1]) | (dst[0] * 8 + dst[1]) << 6
+    return code | PROMOTIONS.index(promotion or "") << 12
+
+
+def decode_move(code):
+    src, dst = code & 63, code >> 6 & 63
+    promotion = PROMOTIONS[code >> 12 & 7] or None
+    return (src // 8, src % 8), (dst // 8, dst % 8), promotion
+
+
+class OpeningBook:
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.map = None
+        self.count = 0
+        if os.fstat(self.file.fileno()).st_size >= HEADER.size:
+            self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, self.count = HEADER.unpack_from(self.map, 0)
+            if magic != MAGIC:
+                self.close()
+                raise ValueError(f"not an opening book: {path}")
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.count
+
+    def key_at(self, index):
+        return struct.unpack_from(">Q", self.map, HEADER.size + index * ENTRY.size)[0]
+
+    def lookup(self, key):
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.key_at(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        moves = []
+        while lo < self.count:
+            entry_key, code, weight = ENTRY.unpack_from(
+                self.map, HEADER.size + lo * ENTRY.size
+            )
+            if entry_key != key:
+                break
+            moves.append((*decode_move(code), weight))
+            lo += 1
+        return moves
+
+    def choose(self, logic, rng=random):
+        legal = logic.get_legal_moves(logic.turn)
+        moves = [m for m in self.lookup(logic.hash) if (m[0], m[1]) in legal]
+        total = sum(m[3] for m in moves)
+        if not total:
+            return None
+        pick = rng.random() * total
+        for src, dst, _, weight in moves:
+            pick -= weight
+            if pick < 0:
+                return src, dst
+        return moves[-1][0], moves[-1][1]
+
+
+def read_games(path):
+    # PGN files are streamed game by game; any other file holds one game per
+    # line, as coordinate or SAN moves with optional move numbers
+    with open(path, encoding="utf-8", errors="replace") as f:
+        if path.lower().endswith(".pgn"):
+            yield from read_pgn(f)
+            return
+        for line in f:
+            tokens = movetext_tokens(COMMENT.sub("", line), [0, False])
+            if tokens:
+                yield {}, [t for t in tokens if t not in RESULTS]
+
+
+def build(paths, output, plies=BOOK_PLIES, min_count=1):
+    counts = Counter()
+    games = 0
+    for path in paths:
+        for headers, moves in read_games(path):
+            if not moves:
+                continue
+            games += 1
+            try:
+                for logic, move in play(headers, moves[:plies]):
+                    counts[logic.hash, encode_move(*move)] += 1
+            except ValueError as e:
+                print(f"⚠️ {path} game {games}: {e}")
+
+    entries = sorted(
+        (key, code, min(count, MAX_WEIGHT))
+        for (key, code), count in counts.items()
+        if count >= min_count
+    )
+    with open(output, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(entries)))
+        for entry in entries:
+            f.write(ENTRY.pack(*entry))
+    return games, len(entries)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Build or query the binary opening book."
+    )
+    sub = parser.add_subparsers(dest="command", required=True)
+    make = sub.add_parser("build", help="compile PGN or move-list files")
+    make.add_argument("inputs", nargs="+")
+    make.add_argument("-o", "--output", default="chess_book.bin")
+    make.add_argument("--plies", type=int, default=BOOK_PLIES)
+    make.add_argument("--min-count", type=int, default=1)
+    probe = sub.add_parser("probe", help="list book moves for a position")
+    probe.add_argument("book")
+    probe.add_argument("--fen", help="position to look up (default: start)")
+    args = parser.parse_args(argv)
+
+    if args.command == "build":
+        games, entries = build(args.inputs, args.output, args.plies, args.min_count)
+        print(f"✅ {games} games, {entries} book entries written to {args.output}")
+        return 0
+
+    logic = ChessLogic()
+    if args.fen:
+        logic.load_fen(args.fen)
+    with OpeningBook(args.book) as book:
+        moves = book.lookup(logic.hash)
+    if not moves:
+        print("⚠️ Position not in book")
+    for src, dst, promotion, weight in moves:
+        print(f"{move_name(src, dst, promotion)} {weight}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
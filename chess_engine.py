@@ -1,179 +1,744 @@
+import multiprocessing
+import multiprocessing.connection
 import random
+import threading
+import time
+from chess_logic import PIECE_VALUE, create_logic, enemy
+from chess_tablebase import MAX_PIECES as TABLEBASE_PIECES, Tablebases
 
-PIECE_VALUE = {"p": 11, "n": 35, "b": 40, "r": 55, "q": 95, "k": 100}
 INF = 10**9
-ai_stop = False
-
-PIECE_SQUARE = {
-    "k": [
-        [-3, -2, -1, 0, 0, -1, -2, -3],
-        [-2, 1, 1, 1, 1, 1, -1, -2],
-        [-1, 1, 1, 1, 1, 1, 1, -1],
-        [0, 1, 1, 1, 1, 1, 1, 0],
-        [0, 0, 0, -1, -1, 0, 0, 0],
-        [3, 2, -1, -2, -2, -1, 2, 3],
-        [4, 3, 2, -1, -1, 1, 3, 4],
-        [4, 8, 6, -1, 0, -1, 8, 4],
-    ],
-    "q": [
-        [-5, 0, 1, 1, 1, 1, 0, -5],
-        [2, 3, 3, 3, 3, 3, 3, 2],
-        [0, 0, 1, 1, 1, 1, 0, 0],
-        [0, 3, 1, 1, 1, 1, 3, 0],
-        [0, 3, 0, 1, 1, 0, 3, 0],
-        [0, 2, 1, 0, 0, 0, 2, 0],
-        [-5, 0, 3, 3, -1, 0, 0, -5],
-        [-5, 3, 3, 3, 3, 0, 0, -5],
-    ],
-    "r": [
-        [1, 1, 1, 1, 1, 1, 1, 1],
-        [3, 7, 7, 7, 7, 7, 7, 3],
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [1, 1, 1, 1, 1, 1, 1, 1],
-        [-2, 0, 1, 1, 1, 1, 0, -2],
-        [-1, -1, 1, 6, 6, 1, -1, -1],
-    ],
-    "b": [
-        [-4, -2, -1, -1, -1, -1, -2, -4],
-        [-2, 0, -1, 0, 0, -1, 0, -2],
-        [1, 0, 1, 1, 1, 1, 0, 1],
-        [0, 1, 1, 1, 1, 1, 1, 0],
-        [0, 0, 8, 1, 1, 8, 0, 0],
-        [-1, 1, 0, 2, 2, 0, 1, -1],
-        [-2, 2, 0, 2, 2, 0, 2, -2],
-        [-4, -2, -2, -1, -1, -2, -2, -4],
-    ],
-    "n": [
-        [-4, -2, -2, -2, -2, -2, -2, -4],
-        [-2, -2, 6, 5, 5, 6, -2, -2],
-        [-2, 2, 3, 4, 4, 3, 2, -2],
-        [-2, 2, 2, 4, 4, 2, 2, -2],
-        [-2, 0, 2, 3, 3, 2, 0, -2],
-        [-2, 1, 6, 2, 2, 6, 1, -2],
-        [-2, -2, 0, 0, 0, 0, -2, -2],
-        [-4, -2, -2, -2, -2, -2, -2, -4],
-    ],
-    "p": [
-        [0, 0, 0, 0, 0, 0, 0, 0],
-        [11, 10, 11, 11, 11, 11, 10, 11],
-        [9, 8, 8, 9, 9, 8, 8, 9],
-        [1, 2, 5, 6, 7, 5, 0, 1],
-        [0, 0, 3, 4, 4, 0, -1, 0],
-        [3, 3, -1, 2, 2, -2, -1, 3],
-        [1, 2, -8, -8, -8, 3, 3, 1],
-        [0, 0, 0, 0, 0, 0, 0, 0],
-    ],
-}
-
-
-def find_best_move(logic, max_depth, callback=None):
+
+# Transposition table entry bounds. Scores are from the point of view of the
+# side that started the search, so that side is folded into the key.
+EXACT, LOWER, UPPER = 0, 1, 2
+PERSPECTIVE_KEY = 0x9E3779B97F4A7C15
+MAX_DEPTH = 64
+QUIESCENCE_DEPTH = 4
+# Pondering shares the process with the GUI, so it stops on its own at this
+# depth or after this many seconds even if the human is still thinking
+PONDER_DEPTH = 6
+PONDER_TIME = 10.0
+# tablebase results rank below real mates (100000) and above any evaluation
+TABLEBASE_WIN = 50000
+
+# Pawn-structure terms per pawn, looked up through the pawn hash table. They are
+# all zero for now, which keeps the evaluation identical to the plain one.
+PAWN_STRUCTURE_WEIGHT = {"doubled": 0, "isolated": 0, "passed": 0}
+last_search = {}
+
+
+class TranspositionTable:
+    def __init__(self, size=1 << 18):
+        # size is rounded down to a power of two so the slot is key & mask
+        self.size = 1 << (size.bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.entries = [None] * self.size
+        self.generation = 0
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+        self.stores = 0
+        self.replacements = 0
+
+    def new_search(self):
+        self.generation += 1
+
+    def probe(self, key):
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            self.hits += 1
+            return entry
+        self.misses += 1
+        if entry is not None:
+            self.collisions += 1
+        return None
+
+    def store(self, key, depth, flag, score, move):
+        slot = key & self.mask
+        old = self.entries[slot]
+        if old is None:
+            self.used += 1
+        elif old[0] != key and old[5] == self.generation and old[1] > depth:
+            # keep deeper entries from the running search, replace the rest
+            return
+        elif old[0] != key:
+            self.replacements += 1
+        self.entries[slot] = (key, depth, flag, score, move, self.generation)
+        self.stores += 1
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "used": self.used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "collisions": self.collisions,
+            "stores": self.stores,
+            "replacements": self.replacements,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
+
+class EvalCache:
+    def __init__(self, size=1 << 16):
+        self.size = 1 << (size.bit_length() - 1)
+        self.mask = self.size - 1
+        self.clear()
+
+    def clear(self):
+        self.keys = [None] * self.size
+        self.values = [None] * self.size
+        self.used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, key):
+        slot = key & self.mask
+        if self.keys[slot] == key:
+            self.hits += 1
+            return self.values[slot]
+        self.misses += 1
+        return None
+
+    def store(self, key, value):
+        slot = key & self.mask
+        if self.keys[slot] is None:
+            self.used += 1
+        self.keys[slot] = key
+        self.values[slot] = value
+
+    def stats(self):
+        probes = self.hits + self.misses
+        return {
+            "size": self.size,
+            "used": self.used,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / probes if probes else 0.0,
+        }
+
+
+transposition_table = TranspositionTable()
+eval_cache = EvalCache(1 << 16)
+pawn_cache = EvalCache(1 << 12)
+
+
+def clear_tables():
+    transposition_table.clear()
+    eval_cache.clear()
+    pawn_cache.clear()
+
+
+def pawn_structure(logic):
+    files = {"w": [[] for _ in range(8)], "b": [[] for _ in range(8)]}
+    for r in range(8):
+        for c in range(8):
+            p = logic.board[r][c]
+            if p and p[1] == "p":
+                files[p[0]][c].append(r)
+
+    counts = {}
+    for color in "wb":
+        own = files[color]
+        other = files[enemy(color)]
+        doubled = isolated = passed = 0
+        for c in range(8):
+            if not own[c]:
+                continue
+            doubled += len(own[c]) - 1
+            if not (c > 0 and own[c - 1]) and not (c < 7 and own[c + 1]):
+                isolated += len(own[c])
+            enemy_rows = [
+                r for cc in range(max(0, c - 1), min(8, c + 2)) for r in other[cc]
+            ]
+            for r in own[c]:
+                if color == "w" and not any(er < r for er in enemy_rows):
+                    passed += 1
+                elif color == "b" and not any(er > r for er in enemy_rows):
+                    passed += 1
+        counts[color] = {"doubled": doubled, "isolated": isolated, "passed": passed}
+    return counts
+
+
+def pawn_score(logic, color):
+    counts = pawn_cache.probe(logic.pawn_hash)
+    if counts is None:
+        counts = pawn_structure(logic)
+        pawn_cache.store(logic.pawn_hash, counts)
+    score = 0
+    for term, weight in PAWN_STRUCTURE_WEIGHT.items():
+        score += weight * (counts[color][term] - counts[enemy(color)][term])
+    return score
+
+
+def tablebase_score(result, plies):
+    # like mate scores this ignores the distance from the root, so a position
+    # scores the same wherever the search meets it
+    if result == 0:
+        return 0
+    score = TABLEBASE_WIN - plies
+    return score if result > 0 else -score
+
+
+class SearchAborted(Exception):
+    pass
+
+
+def is_quiet(logic, mv):
+    (r0, c0), (r1, c1) = mv
+    if logic.board[r1][c1]:
+        return False
+    return logic.board[r0][c0][1] != "p" or (c0 == c1 and r1 != 0 and r1 != 7)
+
+
+def order_moves(logic, moves, tt_move=None, killers=(), history=None):
+    board = logic.board
+
+    def priority(mv):
+        if mv == tt_move:
+            return 1 << 30
+        (r0, c0), (r1, c1) = mv
+        attacker = board[r0][c0][1]
+        victim = board[r1][c1]
+        if victim:
+            gain = PIECE_VALUE[victim[1]]
+        elif attacker == "p" and c0 != c1:
+            gain = PIECE_VALUE["p"]
+        else:
+            gain = 0
+        if attacker == "p" and (r1 == 0 or r1 == 7):
+            gain += PIECE_VALUE["q"]
+        if gain:
+            # MVV-LVA: most valuable victim first, cheapest attacker breaks ties
+            return (1 << 24) + gain * 128 - PIECE_VALUE[attacker]
+        if mv in killers:
+            return (1 << 23) - killers.index(mv)
+        if history:
+            return min(history.get(mv, 0), (1 << 23) - 8)
+        return 0
+
+    return sorted(moves, key=priority, reverse=True)
+
+
+def find_best_move(
+    logic,
+    max_depth,
+    callback=None,
+    tt=None,
+    time_limit=None,
+    node_limit=None,
+    quiescence_depth=QUIESCENCE_DEPTH,
+    rng=None,
+    workers=None,
+    root_moves=None,
+    stop=None,
+    book=None,
+    tablebases=None,
+    min_depth=1,
+):
+    if rng is None:
+        rng = random
     original_turn = logic.turn
+    enemy_color = "b" if original_turn == "w" else "w"
+    perspective = PERSPECTIVE_KEY if original_turn == "b" else 0
+    pawn_terms = any(PAWN_STRUCTURE_WEIGHT.values())
+    start_time = time.perf_counter()
+    deadline = start_time + time_limit if time_limit is not None else None
+    nodes = 0
+    qnodes = 0
+    cutoffs = 0
+    first_move_cutoffs = 0
+    budget = False
+    killers = [[] for _ in range(max_depth + 1)]
+    history = {}
+
+    def evaluate():
+        key = logic.hash ^ perspective
+        score = eval_cache.probe(key)
+        if score is None:
+            score = static_eval()
+            eval_cache.store(key, score)
+        return score
+
+    def static_eval():
+        # material and piece-square terms are kept up to date by make_move
+        score = logic.score_w if original_turn == "w" else logic.score_b
+        if pawn_terms:
+            score += pawn_score(logic, original_turn)
+
+        enemy_king = logic.kings[enemy_color]
+        if enemy_king:
+            mobility = len(logic.potential_moves(*enemy_king))
+            score += (10 - mobility) * 3
+
+        my_king = logic.kings[original_turn]
+        if enemy_king and my_king:
+            dist = abs(my_king[0] - enemy_king[0]) + abs(my_king[1] - enemy_king[1])
+            score += max(0, 100 - dist ^ 2) * 3
+
+        return score
+
+    def quiesce(alpha, beta, maximizing, qdepth):
+        nonlocal qnodes
+        qnodes += 1
+        check_budget()
+        stand_pat = evaluate()
+        if qdepth == 0:
+            return stand_pat
+        if maximizing:
+            if stand_pat >= beta:
+                return stand_pat
+            alpha = max(alpha, stand_pat)
+        else:
+            if stand_pat <= alpha:
+                return stand_pat
+            beta = min(beta, stand_pat)
+
+        best = stand_pat
+        tactical = []
+        for mv in order_moves(logic, logic.get_legal_moves(logic.turn, True)):
+            r1, c1 = mv[1]
+            if logic.board[r1][c1] and r1 != 0 and r1 != 7:
+                exchange = logic.static_exchange(*mv)
+                if exchange < 0:
+                    continue
+            else:
+                exchange = 0
+            tactical.append((exchange, mv))
+        tactical.sort(key=lambda item: item[0], reverse=True)
+        for _, mv in tactical:
+            undo = logic.make_move(*mv)
+            val = quiesce(alpha, beta, not maximizing, qdepth - 1)
+            logic.unmake_move(undo)
+            if maximizing:
+                if val > best:
+                    best = val
+                    alpha = max(alpha, best)
+            elif val < best:
+                best = val
+                beta = min(beta, best)
+            if beta <= alpha:
+                break
+        return best
+
+    def check_budget():
+        if stop is not None and stop.is_set():
+            raise SearchAborted
+        if budget:
+            if node_limit is not None and nodes + qnodes > node_limit:
+                raise SearchAborted
+            if deadline is not None and time.perf_counter() > deadline:
+                raise SearchAborted
+
+    def cutoff(mv, index, depth, ply):
+        nonlocal cutoffs, first_move_cutoffs
+        cutoffs += 1
+        if index == 0:
+            first_move_cutoffs += 1
+        if is_quiet(logic, mv):
+            if mv not in killers[ply]:
+                killers[ply].insert(0, mv)
+                del killers[ply][2:]
+            history[mv] = history.get(mv, 0) + depth * depth
+
+    def minimax(depth, alpha, beta, maximizing, ply=1):
+        nonlocal nodes
+        nodes += 1
+        check_budget()
+
+        if tablebases is not None and logic.piece_count <= TABLEBASE_PIECES:
+            found = tablebases.probe(logic)
+            if found is not None:
+                score = tablebase_score(*found)
+                return score if logic.turn == original_turn else -score
 
-    def minimax(depth, alpha, beta, maximizing):
         if depth == 0:
-            score = 0
-            for r in range(8):
-                for c in range(8):
-                    p = logic.board[r][c]
-                    if not p:
-                        continue
-                    if original_turn == "w":
-                        score += (
-                            PIECE_VALUE[p[1]] if p[0] == "w" else -PIECE_VALUE[p[1]]
-                        )
-                        score += (
-                            PIECE_SQUARE[p[1]][r][c]
-                            if p[0] == "w"
-                            else -PIECE_SQUARE[p[1]][r][c]
-                        )
-                    else:
-                        score += (
-                            PIECE_VALUE[p[1]] if p[0] == "b" else -PIECE_VALUE[p[1]]
-                        )
-                        score += (
-                            PIECE_SQUARE[p[1]][7 - r][c]
-                            if p[0] == "b"
-                            else -PIECE_SQUARE[p[1]][7 - r][c]
-                        )
-
-            enemy_color = "b" if original_turn == "w" else "w"
-            for r in range(8):
-                for c in range(8):
-                    if logic.board[r][c] == enemy_color + "k":
-                        mobility = len(logic.potential_moves(r, c))
-                        score += (10 - mobility) * 3
-                        break
-
-            enemy_king = logic.locate_king(enemy_color)
-            my_king = logic.locate_king(original_turn)
-            if enemy_king and my_king:
-                dist = abs(my_king[0] - enemy_king[0]) + abs(my_king[1] - enemy_king[1])
-                score += max(0, 100 - dist ^ 2) * 3
+            return quiesce(alpha, beta, maximizing, quiescence_depth)
 
-            return score
+        key = logic.hash ^ perspective
+        entry = tt.probe(key)
+        tt_move = None
+        if entry:
+            _, entry_depth, flag, entry_score, tt_move, _ = entry
+            # Only cut off on entries searched to exactly this depth, so a
+            # position's score does not depend on the order it was reached in.
+            if entry_depth == depth:
+                if flag == EXACT:
+                    return entry_score
+                if flag == LOWER and entry_score >= beta:
+                    return entry_score
+                if flag == UPPER and entry_score <= alpha:
+                    return entry_score
 
         legal = logic.get_legal_moves(logic.turn)
         if not legal:
             if logic.is_in_check(logic.turn):
-                return -100000 if maximizing else 100000
+                score = -100000 if maximizing else 100000
             else:
-                return 0
+                score = 0
+            tt.store(key, depth, EXACT, score, None)
+            return score
+        legal = order_moves(logic, legal, tt_move, killers[ply], history)
 
+        alpha_start, beta_start = alpha, beta
+        best_move = None
         if maximizing:
             best = -INF
-            for mv in legal:
-                snap = logic.snapshot()
-                logic.make_move(*mv)
-                if not legal:
-                    if logic.is_in_check(logic.turn):
-                        return -(10**11) if maximizing else 10**11
-                    return 0
-                val = minimax(depth - 1, alpha, beta, False)
-                logic.restore(snap)
-                best = max(best, val)
+            for index, mv in enumerate(legal):
+                undo = logic.make_move(*mv)
+                val = minimax(depth - 1, alpha, beta, False, ply + 1)
+                logic.unmake_move(undo)
+                if val > best:
+                    best = val
+                    best_move = mv
                 alpha = max(alpha, best)
                 if beta <= alpha:
+                    cutoff(mv, index, depth, ply)
                     break
-            return best
         else:
             best = INF
-            for mv in legal:
-                snap = logic.snapshot()
-                logic.make_move(*mv)
-                if not legal:
-                    if logic.is_in_check(logic.turn):
-                        return -(10**11) if maximizing else 10**11
-                    return 0
-                val = minimax(depth - 1, alpha, beta, True)
-                logic.restore(snap)
-                best = min(best, val)
+            for index, mv in enumerate(legal):
+                undo = logic.make_move(*mv)
+                val = minimax(depth - 1, alpha, beta, True, ply + 1)
+                logic.unmake_move(undo)
+                if val < best:
+                    best = val
+                    best_move = mv
                 beta = min(beta, best)
                 if beta <= alpha:
+                    cutoff(mv, index, depth, ply)
                     break
-            return best
 
-    best_move = None
-    best_score = -INF
+        if best <= alpha_start:
+            flag = UPPER
+        elif best >= beta_start:
+            flag = LOWER
+        else:
+            flag = EXACT
+        tt.store(key, depth, flag, best, best_move)
+        return best
+
+    def choose(scored):
+        best_score = -INF
+        best = None
+        top_score = -INF
+        top = None
+        for mv, score in scored:
+            if score > top_score:
+                top_score = score
+                top = mv
+            if score > best_score + 5 - rng.random() * 10:
+                best_score = score
+                best = mv
+            elif score == best_score and rng.random() < 0.1:
+                best = mv
+        return best, top, top_score
+
+    if tt is None:
+        tt = transposition_table
+    tt.new_search()
+
     legal = logic.get_legal_moves(logic.turn)
-    for mv in legal:
-        if callback:
-            callback(mv)
-        snap = logic.snapshot()
-        logic.make_move(*mv)
-        score = minimax(max_depth - 1, -INF, INF, False)
-        logic.restore(snap)
-        if score > best_score + 5 - random.random() * 10:
-            best_score = score
-            best_move = mv
-        elif score == best_score and random.random() < 0.1:
-            best_move = mv
+    if root_moves is not None:
+        legal = [mv for mv in legal if mv in root_moves]
+    best_move = None
+    top_move = None
+    completed_depth = 0
+    top_score = None
+    aborted = False
+    root_scores = []
+
+    book_move = None
+    if book is not None and root_moves is None:
+        book_move = book.choose(logic, rng)
+    if book_move:
+        best_move = book_move
+        legal = []
+
+    tablebase_move = None
+    if tablebases is not None and not book_move and root_moves is None:
+        tablebase_move = tablebases.best_move(logic)
+    if tablebase_move:
+        best_move, result, plies = tablebase_move
+        top_score = tablebase_score(result, plies)
+        legal = []
+
+    if workers and workers > 1 and len(legal) > 1:
+        iterations, partial, nodes, qnodes, aborted = parallel_root_scores(
+            logic,
+            legal,
+            max_depth,
+            workers,
+            callback,
+            time_limit,
+            node_limit,
+            quiescence_depth,
+            stop,
+            tablebases,
+        )
+        for scores in iterations:
+            best_move, top_move, top_score = choose(zip(legal, scores))
+            root_scores.append(scores)
+        completed_depth = len(iterations)
+        if not iterations and partial is not None:
+            # out of time before depth 1 was done: play the best move scored
+            scored = [(mv, sc) for mv, sc in zip(legal, partial) if sc is not None]
+            if scored:
+                best_move, top_move, top_score = choose(scored)
+            else:
+                best_move = legal[0]
+        if top_move:
+            tt.store(
+                logic.hash ^ perspective, completed_depth, EXACT, top_score, top_move
+            )
+        legal = []
+
+    snap = logic.snapshot()
+    for depth in range(min_depth, max_depth + 1 if legal else min_depth):
+        # the first iteration always finishes so there is a move to play; a
+        # single root move searched for parallel_root_scores is the exception
+        budget = completed_depth > 0 or root_moves is not None
+        scores = []
+        try:
+            for mv in legal:
+                if callback:
+                    callback(mv)
+                undo = logic.make_move(*mv)
+                scores.append(minimax(depth - 1, -INF, INF, False))
+                logic.unmake_move(undo)
+        except SearchAborted:
+            logic.restore(snap)
+            aborted = True
+            break
+        best_move, top_move, top_score = choose(zip(legal, scores))
+        root_scores.append(scores)
+        completed_depth = depth
+        if top_move:
+            tt.store(logic.hash ^ perspective, depth, EXACT, top_score, top_move)
+        if len(legal) <= 1 and root_moves is None:
+            break
+
+    # the reply stored for the position after our move is the one to ponder on
+    ponder_move = None
+    if best_move:
+        undo = logic.make_move(*best_move)
+        entry = tt.probe(logic.hash ^ perspective)
+        if entry and entry[4] in logic.get_legal_moves(logic.turn):
+            ponder_move = entry[4]
+        logic.unmake_move(undo)
+
+    last_search.clear()
+    last_search.update(
+        {
+            "depth": completed_depth,
+            "nodes": nodes,
+            "qnodes": qnodes,
+            "time": time.perf_counter() - start_time,
+            "score": top_score,
+            "aborted": aborted,
+            "cutoffs": cutoffs,
+            "first_move_cutoffs": first_move_cutoffs,
+            "first_move_cutoff_rate": (
+                first_move_cutoffs / cutoffs if cutoffs else 0.0
+            ),
+            "root_scores": root_scores,
+            "ponder_move": ponder_move,
+            "book": book_move is not None,
+            "tablebase": tablebase_move is not None,
+        }
+    )
     if callback:
         callback(None)
     return best_move
 
 
+root_workers = []
+worker_tablebases = {}
+
+
+def _root_worker(conn):
+    # Runs in a child process and answers root move searches until the pipe
+    # closes; its tables stay filled from one request to the next
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        conn.send(_search_root_move(*request))
+
+
+def get_root_workers(count):
+    # The workers outlive a search, and root move i always goes to worker
+    # i % count, so each finds its own moves of the depth before in its tables
+    if len(root_workers) != count:
+        close_root_workers()
+        for _ in range(count):
+            conn, child = multiprocessing.Pipe()
+            process = multiprocessing.Process(
+                target=_root_worker, args=(child,), daemon=True
+            )
+            process.start()
+            child.close()
+            root_workers.append((process, conn))
+    return root_workers
+
+
+def close_root_workers():
+    # terminate rather than wait, since a running search may have no deadline
+    for process, conn in root_workers:
+        process.terminate()
+        process.join()
+        conn.close()
+    root_workers.clear()
+
+
+def _search_root_move(backend, fen, move, depth, deadline, node_limit, qdepth, tb_dir):
+    logic = create_logic(backend)
+    logic.load_fen(fen)
+    tablebases = None
+    if tb_dir is not None:
+        if tb_dir not in worker_tablebases:
+            worker_tablebases[tb_dir] = Tablebases(tb_dir)
+        tablebases = worker_tablebases[tb_dir]
+    time_limit = None if deadline is None else max(0.0, deadline - time.time())
+    find_best_move(
+        logic,
+        depth,
+        time_limit=time_limit,
+        node_limit=node_limit,
+        quiescence_depth=qdepth,
+        root_moves=[move],
+        tablebases=tablebases,
+        min_depth=depth,
+    )
+    score = last_search["score"] if last_search["depth"] == depth else None
+    return score, last_search["nodes"], last_search["qnodes"]
+
+
+def parallel_root_scores(
+    logic,
+    legal,
+    max_depth,
+    workers,
+    callback,
+    time_limit,
+    node_limit,
+    qdepth,
+    stop,
+    tablebases=None,
+):
+    # Each root move gets a full-window search of its own, so its score does not
+    # depend on the other moves and the caller can pick the move per depth just
+    # like the serial loop. A request searches one depth only. Returns the
+    # finished depths, the scores of an unfinished first depth (None when
+    # stopped), the node counts and whether the search was cut short.
+    fen = logic.fen()
+    deadline = None if time_limit is None else time.time() + time_limit
+    tb_dir = None if tablebases is None else tablebases.directory
+    pool = get_root_workers(workers)
+    iterations = []
+    nodes = qnodes = 0
+    for depth in range(1, max_depth + 1):
+        queues = [list(range(k, len(legal), len(pool))) for k in range(len(pool))]
+        busy = {}
+        scores = [None] * len(legal)
+
+        def dispatch(k):
+            if queues[k]:
+                index = queues[k].pop(0)
+                request = (logic.backend, fen, legal[index], depth, deadline)
+                pool[k][1].send(request + (node_limit, qdepth, tb_dir))
+                busy[pool[k][1]] = (k, index)
+                if callback:
+                    callback(legal[index])
+
+        for k in range(len(pool)):
+            dispatch(k)
+        while busy:
+            if stop is not None and stop.is_set():
+                close_root_workers()
+                return iterations, None, nodes, qnodes, True
+            for conn in multiprocessing.connection.wait(list(busy), 0.05):
+                k, index = busy.pop(conn)
+                scores[index], move_nodes, move_qnodes = conn.recv()
+                nodes += move_nodes
+                qnodes += move_qnodes
+                dispatch(k)
+        if None in scores:
+            return iterations, scores, nodes, qnodes, True
+        iterations.append(scores)
+    return iterations, None, nodes, qnodes, False
+
+
+class Ponder:
+    def __init__(self):
+        self.thread = None
+        self.stop = threading.Event()
+        self.key = None
+        self.move = None
+        self.started = 0.0
+
+    def start(
+        self, logic, reply, max_depth=PONDER_DEPTH, time_limit=PONDER_TIME, **options
+    ):
+        # search the position after the predicted reply on a copy, until the
+        # game catches up with it, it is cancelled or it runs out of budget
+        self.cancel()
+        if reply is None:
+            return False
+        board = logic.copy()
+        board.make_move(*reply)
+        self.key = board.hash
+        self.move = None
+        self.stop = threading.Event()
+        self.started = time.perf_counter()
+        options["time_limit"] = time_limit
+        self.thread = threading.Thread(
+            target=self._run, args=(board, max_depth, options), daemon=True
+        )
+        self.thread.start()
+        return True
+
+    def _run(self, board, max_depth, options):
+        self.move = find_best_move(board, max_depth, stop=self.stop, **options)
+
+    def cancel(self):
+        # may be called from the GUI thread while a search thread is finishing
+        thread = self.thread
+        if thread:
+            self.stop.set()
+            thread.join()
+            self.thread = None
+        self.key = None
+
+    def follow(self, logic):
+        # called after every move on the board; the search only goes on while
+        # the game is in the position it is searching
+        if self.thread and self.key != logic.hash:
+            self.cancel()
+
+    def finish(self, logic, time_limit=None):
+        # On a hit the running search gets what is left of time_limit and its
+        # move is returned. On a miss it is stopped and None is returned; what
+        # it stored in the tables is still there for the next search.
+        thread = self.thread
+        if thread is None or self.key != logic.hash:
+            self.cancel()
+            return None
+        if time_limit is not None:
+            thread.join(max(0.0, time_limit - self.elapsed()))
+        self.cancel()
+        return self.move
+
+    def elapsed(self):
+        return time.perf_counter() - self.started if self.thread else 0.0
+
+
 def find_random_move(logic):
     legal_moves = logic.get_legal_moves(logic.turn)
     if not legal_moves:
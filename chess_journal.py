@@ -0,0 +1,287 @@
+import argparse
+import json
+import os
+import sys
+import zlib
+
+from chess_logic import create_logic, move_name
+
+# One text record per line: "P <ply> <fen> <crc>" places a position at that ply
+# and "M <ply> <uci> <crc>" plays the move that reaches it. "C <ply> <fen> <crc>"
+# follows the move of every checkpoint ply, so loading only has to play the
+# moves after the last one. A record for an earlier ply drops everything after
+# it, so undoing and playing on never rewrites the file. The crc32 covers the
+# rest of the line; reading stops at the first record that is cut short or does
+# not match, and that tail is truncated.
+JOURNAL_PATH = "chess_save.log"
+SYNC_EVERY = 8
+COMPACT_MIN = 64
+COMPACT_RATIO = 2
+
+
+def encode_record(kind, ply, text):
+    body = f"{kind} {ply} {text}"
+    return f"{body} {zlib.crc32(body.encode()):08x}\n".encode()
+
+
+def decode_record(line):
+    if not line.endswith(b"\n"):
+        return None
+    try:
+        body, crc = line[:-1].decode().rsplit(" ", 1)
+        if int(crc, 16) != zlib.crc32(body.encode()):
+            return None
+        kind, ply, text = body.split(" ", 2)
+        ply = int(ply)
+    except ValueError:
+        return None
+    if kind not in ("P", "M", "C") or ply < 0:
+        return None
+    return kind, ply, text
+
+
+def read_records(path):
+    records = []
+    size = 0
+    with open(path, "rb") as f:
+        for line in f:
+            record = decode_record(line)
+            if record is None:
+                break
+            records.append(record)
+            size += len(line)
+    return records, size
+
+
+def recover(path):
+    records, size = read_records(path)
+    torn = os.path.getsize(path) - size
+    if torn:
+        with open(path, "r+b") as f:
+            f.truncate(size)
+        print(f"⚠️ Dropped {torn} damaged bytes from the end of {path}")
+    return records
+
+
+def place(logic, ply, fen):
+    if ply:
+        logic.seek(ply - 1)
+        logic.place(fen)
+    else:
+        logic.load_fen(fen)
+
+
+def replay(records, backend="list"):
+    # Only the text of the records is followed here; the moves are played when
+    # the board first reaches them, starting from the checkpoint nearest the end
+    moves = []
+    checkpoints = {}
+    for kind, ply, text in records:
+        if kind == "C":
+            if ply != len(moves) - 1 or moves[ply] is None:
+                raise ValueError(f"checkpoint without its move at ply {ply}")
+            checkpoints[ply] = text
+            continue
+        if ply > len(moves) or (kind == "M" and ply == 0):
+            raise ValueError(f"journal skips to ply {ply}")
+        if ply < len(moves):
+            del moves[ply:]
+            for k in [k for k in checkpoints if k >= ply]:
+                del checkpoints[k]
+        if kind == "P":
+            moves.append(None)
+            checkpoints[ply] = text
+        else:
+            moves.append(text)
+
+    logic = create_logic(backend)
+    if moves:
+        logic.load_history(moves, checkpoints)
+    return logic
+
+
+def checkpoint_fen(logic, ply):
+    snap = logic.checkpoints[ply]
+    if isinstance(snap, str):
+        return snap
+    position = type(logic)()
+    position.restore(snap)
+    return position.fen()
+
+
+def ply_records(logic, ply):
+    undo = logic.history[ply]
+    if undo is None:
+        return [("P", ply, checkpoint_fen(logic, ply))]
+    if isinstance(undo, str):
+        records = [("M", ply, undo)]
+    else:
+        promoted = undo[8]
+        move = move_name(undo[0], undo[1], promoted and promoted[1])
+        records = [("M", ply, move)]
+    if ply in logic.checkpoints:
+        records.append(("C", ply, checkpoint_fen(logic, ply)))
+    return records
+
+
+class Journal:
+    def __init__(self, path=JOURNAL_PATH, sync_every=SYNC_EVERY):
+        self.path = path
+        self.sync_every = sync_every
+        self.file = None
+        self.records = 0
+        self.pending = 0
+
+    def load(self, backend="list"):
+        records = recover(self.path) if os.path.exists(self.path) else []
+        logic = replay(records, backend)
+        self.records = len(records)
+        return logic
+
+    def open(self):
+        if self.file is None:
+            self.file = open(self.path, "ab")
+
+    def append(self, kind, ply, text):
+        self.open()
+        self.file.write(encode_record(kind, ply, text))
+        self.file.flush()
+        self.records += 1
+        self.pending += 1
+        if self.pending >= self.sync_every:
+            self.sync()
+
+    def record(self, logic):
+        for record in ply_records(logic, logic.history_index):
+            self.append(*record)
+        if self.records > COMPACT_MIN + COMPACT_RATIO * len(logic.history):
+            self.compact(logic)
+
+    def sync(self):
+        if self.file is not None and self.pending:
+            os.fsync(self.file.fileno())
+        self.pending = 0
+
+    def close(self):
+        if self.file is not None:
+            self.sync()
+            self.file.close()
+            self.file = None
+
+    def compact(self, logic):
+        self.close()
+        write_journal(logic, self.path)
+        self.records = len(logic.history) + len(logic.checkpoints)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def write_journal(logic, path):
+    temp = path + ".tmp"
+    with open(temp, "wb") as f:
+        for ply in range(len(logic.history)):
+            for record in ply_records(logic, ply):
+                f.write(encode_record(*record))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp, path)
+
+
+def read_json_list(f, chunk=1 << 16):
+    # Yields the items of a top-level JSON list while reading the file in
+    # chunks, so a long save never has to be parsed as a whole
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        buffer = buffer.lstrip()
+        if started and buffer[:1] == ",":
+            buffer = buffer[1:].lstrip()
+        if buffer:
+            if not started:
+                if buffer[0] != "[":
+                    raise ValueError("expected a JSON list")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer[0] == "]":
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                pass
+            else:
+                yield item
+                buffer = buffer[end:]
+                continue
+        more = f.read(chunk)
+        if not more:
+            raise ValueError("unexpected end of JSON save")
+        buffer += more
+
+
+def convert_state(logic, ply, state):
+    # A saved board becomes a move record when a legal move from the board
+    # before it reproduces it, and a position record otherwise
+    snap = {
+        "board": [
+            [cell if cell != "__" else "" for cell in row.split(" ")]
+            for row in state["board"]
+        ],
+        "turn": state["turn"],
+        "has_moved": state["has_moved"],
+        "en_passant": state["en_passant"] and tuple(state["en_passant"]),
+    }
+    position = type(logic)()
+    position.restore(snap)
+    fen = position.fen()
+    move = state["last_move"]
+    if ply and move:
+        src, dst = tuple(move[0]), tuple(move[1])
+        if (src, dst) in logic.legal_moves():
+            promoted = snap["board"][dst[0]][dst[1]]
+            logic.do_move(src, dst, lambda color: promoted[1:])
+            if logic.fen() == fen:
+                return
+            logic.undo()
+    place(logic, ply, fen)
+
+
+def convert(json_path, path, backend="list"):
+    logic = create_logic(backend)
+    with open(json_path, encoding="utf-8") as f:
+        for ply, state in enumerate(read_json_list(f)):
+            convert_state(logic, ply, state)
+    write_journal(logic, path)
+    return len(logic.history)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Convert or compact game journals.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    make = sub.add_parser("convert", help="turn a JSON save into a journal")
+    make.add_argument("save")
+    make.add_argument("-o", "--output", default=JOURNAL_PATH)
+    squeeze = sub.add_parser("compact", help="rewrite a journal as its live plies")
+    squeeze.add_argument("journal", nargs="?", default=JOURNAL_PATH)
+    args = parser.parse_args(argv)
+
+    if args.command == "convert":
+        plies = convert(args.save, args.output)
+        print(f"✅ {plies} saved positions written to {args.output}")
+        return 0
+
+    journal = Journal(args.journal)
+    logic = journal.load()
+    before = journal.records
+    journal.compact(logic)
+    print(f"✅ {before} records compacted to {journal.records} in {args.journal}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
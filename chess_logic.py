@@ -1,4 +1,5 @@
 from copy import deepcopy
+import random
 
 SYM = {
     "wp": "♙",
@@ -27,6 +28,111 @@ START_BOARD = [
     ["wr", "wn", "wb", "wq", "wk", "wb", "wn", "wr"],
 ]
 
+PIECE_VALUE = {"p": 11, "n": 35, "b": 40, "r": 55, "q": 95, "k": 100}
+
+PIECE_SQUARE = {
+    "k": [
+        [-3, -2, -1, 0, 0, -1, -2, -3],
+        [-2, 1, 1, 1, 1, 1, -1, -2],
+        [-1, 1, 1, 1, 1, 1, 1, -1],
+        [0, 1, 1, 1, 1, 1, 1, 0],
+        [0, 0, 0, -1, -1, 0, 0, 0],
+        [3, 2, -1, -2, -2, -1, 2, 3],
+        [4, 3, 2, -1, -1, 1, 3, 4],
+        [4, 8, 6, -1, 0, -1, 8, 4],
+    ],
+    "q": [
+        [-5, 0, 1, 1, 1, 1, 0, -5],
+        [2, 3, 3, 3, 3, 3, 3, 2],
+        [0, 0, 1, 1, 1, 1, 0, 0],
+        [0, 3, 1, 1, 1, 1, 3, 0],
+        [0, 3, 0, 1, 1, 0, 3, 0],
+        [0, 2, 1, 0, 0, 0, 2, 0],
+        [-5, 0, 3, 3, -1, 0, 0, -5],
+        [-5, 3, 3, 3, 3, 0, 0, -5],
+    ],
+    "r": [
+        [1, 1, 1, 1, 1, 1, 1, 1],
+        [3, 7, 7, 7, 7, 7, 7, 3],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [1, 1, 1, 1, 1, 1, 1, 1],
+        [-2, 0, 1, 1, 1, 1, 0, -2],
+        [-1, -1, 1, 6, 6, 1, -1, -1],
+    ],
+    "b": [
+        [-4, -2, -1, -1, -1, -1, -2, -4],
+        [-2, 0, -1, 0, 0, -1, 0, -2],
+        [1, 0, 1, 1, 1, 1, 0, 1],
+        [0, 1, 1, 1, 1, 1, 1, 0],
+        [0, 0, 8, 1, 1, 8, 0, 0],
+        [-1, 1, 0, 2, 2, 0, 1, -1],
+        [-2, 2, 0, 2, 2, 0, 2, -2],
+        [-4, -2, -2, -1, -1, -2, -2, -4],
+    ],
+    "n": [
+        [-4, -2, -2, -2, -2, -2, -2, -4],
+        [-2, -2, 6, 5, 5, 6, -2, -2],
+        [-2, 2, 3, 4, 4, 3, 2, -2],
+        [-2, 2, 2, 4, 4, 2, 2, -2],
+        [-2, 0, 2, 3, 3, 2, 0, -2],
+        [-2, 1, 6, 2, 2, 6, 1, -2],
+        [-2, -2, 0, 0, 0, 0, -2, -2],
+        [-4, -2, -2, -2, -2, -2, -2, -4],
+    ],
+    "p": [
+        [0, 0, 0, 0, 0, 0, 0, 0],
+        [11, 10, 11, 11, 11, 11, 10, 11],
+        [9, 8, 8, 9, 9, 8, 8, 9],
+        [1, 2, 5, 6, 7, 5, 0, 1],
+        [0, 0, 3, 4, 4, 0, -1, 0],
+        [3, 3, -1, 2, 2, -2, -1, 3],
+        [1, 2, -8, -8, -8, 3, 3, 1],
+        [0, 0, 0, 0, 0, 0, 0, 0],
+    ],
+}
+
+# Material plus piece-square score of one piece, signed for the side the
+# evaluation is for. White's view reads PIECE_SQUARE as-is for both colours,
+# black's view reads it upside down, exactly like the engine's leaf scan did.
+PIECES = [color + type for color in "wb" for type in "pnbrqk"]
+POSITION_CACHE_SIZE = 4096
+CHECKPOINT_EVERY = 16
+
+
+def _piece_scores(piece, view):
+    sign = 1 if piece[0] == view else -1
+    table = PIECE_SQUARE[piece[1]]
+    if view == "b":
+        table = table[::-1]
+    return [
+        [sign * (PIECE_VALUE[piece[1]] + table[r][c]) for c in range(8)]
+        for r in range(8)
+    ]
+
+
+SCORE_W = {p: _piece_scores(p, "w") for p in PIECES}
+SCORE_B = {p: _piece_scores(p, "b") for p in PIECES}
+
+KNIGHT_STEPS = [(-2, -1), (-2, 1), (-1, -2), (-1, 2), (1, -2), (1, 2), (2, -1), (2, 1)]
+KING_STEPS = [(-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)]
+DIAGONALS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+ORTHOGONALS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+# Fixed seed so position keys stay the same between runs (opening books and
+# other on-disk tables are keyed by them).
+_zobrist_rng = random.Random(0x5EED)
+ZOBRIST_PIECE = {
+    p: [[_zobrist_rng.getrandbits(64) for c in range(8)] for r in range(8)]
+    for p in PIECES
+}
+ZOBRIST_CASTLING = {
+    key: _zobrist_rng.getrandbits(64) for key in ("wR0", "wR7", "bR0", "bR7")
+}
+ZOBRIST_EN_PASSANT = [_zobrist_rng.getrandbits(64) for c in range(8)]
+ZOBRIST_BLACK = _zobrist_rng.getrandbits(64)
+
 
 def in_bounds(r, c):
     return 0 <= r < 8 and 0 <= c < 8
@@ -44,7 +150,22 @@ def enemy(turn):
     return "b" if turn == "w" else "w"
 
 
+def square_name(square):
+    r, c = square
+    return "abcdefgh"[c] + str(8 - r)
+
+
+def parse_square(name):
+    return (8 - int(name[1]), "abcdefgh".index(name[0]))
+
+
+def move_name(src, dst, promotion=None):
+    return square_name(src) + square_name(dst) + (promotion or "")
+
+
 class ChessLogic:
+    backend = "list"
+
     def __init__(self):
         self.board = deepcopy(START_BOARD)
         self.turn = "w"
@@ -55,26 +176,165 @@ class ChessLogic:
             "bR0": False,
             "bR7": False,
         }
-        self.history_index = 0
-        self.history = [self.snapshot()]
-
-    def locate_king(self, color_k):
+        self.position_cache = {}
+        self.refresh()
+        self.reset_history()
+
+    def refresh(self):
+        self.hash = self.compute_hash()
+        self.pawn_hash = 0
+        self.score_w = 0
+        self.score_b = 0
+        self.kings = {"w": None, "b": None}
+        self.piece_count = 0
         for r in range(8):
             for c in range(8):
-                if self.board[r][c] == color_k + "k":
-                    return (r, c)
-        return None
-
-    def is_square_attacked(self, target_r, target_c, attack_color):
+                p = self.board[r][c]
+                if p:
+                    self.piece_count += 1
+                    self.score_w += SCORE_W[p][r][c]
+                    self.score_b += SCORE_B[p][r][c]
+                    if p[1] == "p":
+                        self.pawn_hash ^= ZOBRIST_PIECE[p][r][c]
+                    elif p[1] == "k":
+                        self.kings[p[0]] = (r, c)
+
+    def compute_hash(self):
+        h = 0
         for r in range(8):
             for c in range(8):
                 p = self.board[r][c]
-                if not p or find_color(p) != attack_color:
-                    continue
-                for tr, tc in self.potential_moves(r, c, ignore_castle=True):
-                    if (tr, tc) == (target_r, target_c):
-                        return True
-        return False
+                if p:
+                    h ^= ZOBRIST_PIECE[p][r][c]
+        for key, moved in self.defined_castling.items():
+            if not moved:
+                h ^= ZOBRIST_CASTLING[key]
+        if self.en_passant:
+            h ^= ZOBRIST_EN_PASSANT[self.en_passant[1]]
+        if self.turn == "b":
+            h ^= ZOBRIST_BLACK
+        return h
+
+    def locate_king(self, color_k):
+        return self.kings[color_k]
+
+    def attackers(self, target_r, target_c, attack_color, first=False):
+        board = self.board
+        found = []
+
+        pr = target_r + 1 if attack_color == "w" else target_r - 1
+        if 0 <= pr < 8:
+            for pc in (target_c - 1, target_c + 1):
+                if 0 <= pc < 8 and board[pr][pc] == attack_color + "p":
+                    found.append((pr, pc))
+                    if first:
+                        return found
+
+        for steps, type in ((KNIGHT_STEPS, "n"), (KING_STEPS, "k")):
+            piece = attack_color + type
+            for dr, dc in steps:
+                mr, mc = target_r + dr, target_c + dc
+                if 0 <= mr < 8 and 0 <= mc < 8 and board[mr][mc] == piece:
+                    found.append((mr, mc))
+                    if first:
+                        return found
+
+        for dirs, sliders in ((DIAGONALS, "bq"), (ORTHOGONALS, "rq")):
+            for dr, dc in dirs:
+                mr, mc = target_r + dr, target_c + dc
+                while 0 <= mr < 8 and 0 <= mc < 8:
+                    p = board[mr][mc]
+                    if p:
+                        if p[0] == attack_color and p[1] in sliders:
+                            found.append((mr, mc))
+                            if first:
+                                return found
+                        break
+                    mr += dr
+                    mc += dc
+        return found
+
+    def least_valuable_attacker(self, target_r, target_c, attack_color, removed):
+        # Like attackers(), but squares in removed count as empty, so sliders
+        # lined up behind a piece that already captured (x-rays) join in.
+        board = self.board
+        best = None
+        best_value = PIECE_VALUE["k"] + 1
+
+        pr = target_r + 1 if attack_color == "w" else target_r - 1
+        if 0 <= pr < 8:
+            for pc in (target_c - 1, target_c + 1):
+                if (
+                    0 <= pc < 8
+                    and board[pr][pc] == attack_color + "p"
+                    and (pr, pc) not in removed
+                ):
+                    return (pr, pc)
+
+        for steps, type in ((KNIGHT_STEPS, "n"), (KING_STEPS, "k")):
+            piece = attack_color + type
+            for dr, dc in steps:
+                mr, mc = target_r + dr, target_c + dc
+                if (
+                    0 <= mr < 8
+                    and 0 <= mc < 8
+                    and board[mr][mc] == piece
+                    and (mr, mc) not in removed
+                    and PIECE_VALUE[type] < best_value
+                ):
+                    best, best_value = (mr, mc), PIECE_VALUE[type]
+
+        for dirs, sliders in ((DIAGONALS, "bq"), (ORTHOGONALS, "rq")):
+            for dr, dc in dirs:
+                mr, mc = target_r + dr, target_c + dc
+                while 0 <= mr < 8 and 0 <= mc < 8:
+                    p = board[mr][mc]
+                    if p and (mr, mc) not in removed:
+                        if (
+                            p[0] == attack_color
+                            and p[1] in sliders
+                            and PIECE_VALUE[p[1]] < best_value
+                        ):
+                            best, best_value = (mr, mc), PIECE_VALUE[p[1]]
+                        break
+                    mr += dr
+                    mc += dc
+        return best
+
+    def static_exchange(self, src, dst):
+        board = self.board
+        r1, c1 = dst
+        piece = board[src[0]][src[1]]
+        color = piece[0]
+        removed = {src}
+        victim = board[r1][c1]
+        if not victim and piece[1] == "p" and src[1] != c1:
+            victim = enemy(color) + "p"
+            removed.add((src[0], c1))
+
+        gains = [PIECE_VALUE[victim[1]] if victim else 0]
+        on_square = piece[1]
+        side = enemy(color)
+        while True:
+            sq = self.least_valuable_attacker(r1, c1, side, removed)
+            if sq is None:
+                break
+            capturer = board[sq[0]][sq[1]][1]
+            if capturer == "k":
+                removed.add(sq)
+                if self.least_valuable_attacker(r1, c1, enemy(side), removed):
+                    break
+            gains.append(PIECE_VALUE[on_square] - gains[-1])
+            on_square = capturer
+            removed.add(sq)
+            side = enemy(side)
+
+        for i in range(len(gains) - 1, 0, -1):
+            gains[i - 1] = -max(-gains[i - 1], gains[i])
+        return gains[0]
+
+    def is_square_attacked(self, target_r, target_c, attack_color):
+        return bool(self.attackers(target_r, target_c, attack_color, first=True))
 
     def is_in_check(self, color):
         king_pos = self.locate_king(color)
@@ -107,16 +367,7 @@ class ChessLogic:
                     moves.append((er, ec))
 
         elif type == "n":
-            for dr, dc in [
-                (-2, -1),
-                (-2, 1),
-                (-1, -2),
-                (-1, 2),
-                (1, -2),
-                (1, 2),
-                (2, -1),
-                (2, 1),
-            ]:
+            for dr, dc in KNIGHT_STEPS:
                 mr, mc = pr + dr, pc + dc
                 if in_bounds(mr, mc) and find_color(self.board[mr][mc]) != color:
                     moves.append((mr, mc))
@@ -148,105 +399,451 @@ class ChessLogic:
                     if in_bounds(mr, mc) and find_color(self.board[mr][mc]) != color:
                         moves.append((mr, mc))
             if not ignore_castle:
-                if self.is_in_check(color):
-                    return moves
-                row_home = 7 if color == "w" else 0
-                if (
-                    not self.defined_castling[f"{color}R7"]
-                    and self.board[row_home][5] == ""
-                    and self.board[row_home][6] == ""
-                    and not self.is_square_attacked(row_home, 5, enemy(color))
-                ):
-                    moves.append((row_home, 6))
-                if (
-                    not self.defined_castling[f"{color}R0"]
-                    and self.board[row_home][3] == ""
-                    and self.board[row_home][2] == ""
-                    and self.board[row_home][1] == ""
-                    and not self.is_square_attacked(row_home, 3, enemy(color))
-                ):
-                    moves.append((row_home, 2))
+                moves += self.castling_moves(color)
+        return moves
+
+    def castling_moves(self, color):
+        moves = []
+        if self.is_in_check(color):
+            return moves
+        row_home = 7 if color == "w" else 0
+        if (
+            not self.defined_castling[f"{color}R7"]
+            and self.board[row_home][5] == ""
+            and self.board[row_home][6] == ""
+            and not self.is_square_attacked(row_home, 5, enemy(color))
+        ):
+            moves.append((row_home, 6))
+        if (
+            not self.defined_castling[f"{color}R0"]
+            and self.board[row_home][3] == ""
+            and self.board[row_home][2] == ""
+            and self.board[row_home][1] == ""
+            and not self.is_square_attacked(row_home, 3, enemy(color))
+        ):
+            moves.append((row_home, 2))
         return moves
 
     def make_move(self, src, dst, promotion_callback=None):
         r0, c0 = src
         r1, c1 = dst
-        piece = self.board[r0][c0]
-        color = find_color(piece)
-
-        if piece == color + "k":
-            self.defined_castling[f"{color}R0"] = True
-            self.defined_castling[f"{color}R7"] = True
-        if piece == color + "r":
-            if c0 == 0:
+        board = self.board
+        piece = board[r0][c0]
+        color = piece[0] if piece else ""
+        type = piece[1] if piece else ""
+
+        captured = board[r1][c1]
+        capture_sq = dst
+        castling = None
+        rook_move = None
+        promoted = None
+        en_passant = self.en_passant
+        # hash, pawn hash and evaluation sums before the move, for unmake
+        old_state = (self.hash, self.pawn_hash, self.score_w, self.score_b)
+        h = self.hash ^ ZOBRIST_BLACK ^ ZOBRIST_PIECE[piece][r0][c0]
+        pawn_hash = self.pawn_hash
+        score_w = self.score_w - SCORE_W[piece][r0][c0]
+        score_b = self.score_b - SCORE_B[piece][r0][c0]
+        if en_passant:
+            h ^= ZOBRIST_EN_PASSANT[en_passant[1]]
+
+        if type == "k" or type == "r":
+            castling = self.defined_castling.copy()
+            if type == "k":
+                self.defined_castling[f"{color}R0"] = True
+                self.defined_castling[f"{color}R7"] = True
+            elif c0 == 0:
                 self.defined_castling[f"{color}R0"] = True
             elif c0 == 7:
                 self.defined_castling[f"{color}R7"] = True
+            for key, moved in castling.items():
+                if moved != self.defined_castling[key]:
+                    h ^= ZOBRIST_CASTLING[key]
 
         self.en_passant = None
-        if find_type(piece) == "p" and (r0 != r1 and self.board[r1][c1] == ""):
-            if color == "w":
-                self.board[r1 + 1][c1] = ""
-            else:
-                self.board[r1 - 1][c1] = ""
-
-        if find_type(piece) == "p" and abs(r1 - r0) == 2:
-            self.en_passant = ((r0 + r1) // 2, c0)
-
-        if find_type(piece) == "k" and abs(c1 - c0) == 2:
-            if c1 > c0:
-                self.board[r1][5] = self.board[r1][7]
-                self.board[r1][7] = ""
-                self.defined_castling[f"{color}R7"] = True
-            else:
-                self.board[r1][3] = self.board[r1][0]
-                self.board[r1][0] = ""
-                self.defined_castling[f"{color}R0"] = True
-
-        if find_type(piece) == "p" and (r1 == 0 or r1 == 7):
+        if type == "p":
+            pawn_hash ^= ZOBRIST_PIECE[piece][r0][c0]
+            if c0 != c1 and captured == "":
+                capture_sq = (r1 + 1, c1) if color == "w" else (r1 - 1, c1)
+                captured = board[capture_sq[0]][c1]
+                board[capture_sq[0]][c1] = ""
+            if abs(r1 - r0) == 2:
+                self.en_passant = ((r0 + r1) // 2, c0)
+                h ^= ZOBRIST_EN_PASSANT[c0]
+        if captured:
+            cr, cc = capture_sq
+            self.piece_count -= 1
+            h ^= ZOBRIST_PIECE[captured][cr][cc]
+            score_w -= SCORE_W[captured][cr][cc]
+            score_b -= SCORE_B[captured][cr][cc]
+            if captured[1] == "p":
+                pawn_hash ^= ZOBRIST_PIECE[captured][cr][cc]
+            elif captured[1] == "k":
+                self.kings[captured[0]] = None
+
+        if type == "k" and abs(c1 - c0) == 2:
+            rook_c0, rook_c1 = (7, 5) if c1 > c0 else (0, 3)
+            rook = board[r1][rook_c0]
+            rook_move = (r1, rook_c0, rook_c1, rook)
+            board[r1][rook_c1] = rook
+            board[r1][rook_c0] = ""
+            if rook:
+                h ^= ZOBRIST_PIECE[rook][r1][rook_c0] ^ ZOBRIST_PIECE[rook][r1][rook_c1]
+                score_w += SCORE_W[rook][r1][rook_c1] - SCORE_W[rook][r1][rook_c0]
+                score_b += SCORE_B[rook][r1][rook_c1] - SCORE_B[rook][r1][rook_c0]
+
+        if type == "p" and (r1 == 0 or r1 == 7):
             promote = None
             if promotion_callback:
                 promote = promotion_callback(color)
             if not promote:
                 promote = "q"
-            self.board[r1][c1] = color + promote
+            promoted = color + promote
+            board[r1][c1] = promoted
+            h ^= ZOBRIST_PIECE[promoted][r1][c1]
+            score_w += SCORE_W[promoted][r1][c1]
+            score_b += SCORE_B[promoted][r1][c1]
         else:
-            self.board[r1][c1] = piece
-
-        self.board[r0][c0] = ""
+            board[r1][c1] = piece
+            h ^= ZOBRIST_PIECE[piece][r1][c1]
+            score_w += SCORE_W[piece][r1][c1]
+            score_b += SCORE_B[piece][r1][c1]
+            if type == "p":
+                pawn_hash ^= ZOBRIST_PIECE[piece][r1][c1]
+            elif type == "k":
+                self.kings[color] = dst
+
+        board[r0][c0] = ""
+        self.turn = enemy(self.turn)
+        self.hash = h
+        self.pawn_hash = pawn_hash
+        self.score_w = score_w
+        self.score_b = score_b
+        return (
+            src,
+            dst,
+            piece,
+            captured,
+            capture_sq,
+            en_passant,
+            castling,
+            rook_move,
+            promoted,
+            old_state,
+        )
+
+    def unmake_move(self, undo):
+        src, dst, piece, captured, capture_sq = undo[:5]
+        en_passant, castling, rook_move = undo[5:8]
+        board = self.board
+        board[src[0]][src[1]] = piece
+        board[dst[0]][dst[1]] = ""
+        board[capture_sq[0]][capture_sq[1]] = captured
+        if rook_move:
+            r, rook_c0, rook_c1, rook = rook_move
+            board[r][rook_c1] = ""
+            board[r][rook_c0] = rook
+        if castling is not None:
+            self.defined_castling = castling
+        self.en_passant = en_passant
         self.turn = enemy(self.turn)
+        self.hash, self.pawn_hash, self.score_w, self.score_b = undo[9]
+        if piece[1] == "k":
+            self.kings[piece[0]] = src
+        if captured:
+            self.piece_count += 1
+            if captured[1] == "k":
+                self.kings[captured[0]] = capture_sq
+
+    def check_state(self, color, king):
+        # squares a non-king move must land on when in check (None when not in
+        # check) and the pinned pieces with the direction of their pin ray
+        board = self.board
+        kr, kc = king
+        evasions = None
+        checkers = self.attackers(kr, kc, enemy(color))
+        if len(checkers) > 1:
+            evasions = set()
+        elif checkers:
+            cr, cc = checkers[0]
+            evasions = {(cr, cc)}
+            if board[cr][cc][1] in "brq":
+                dr = (cr > kr) - (cr < kr)
+                dc = (cc > kc) - (cc < kc)
+                mr, mc = kr + dr, kc + dc
+                while (mr, mc) != (cr, cc):
+                    evasions.add((mr, mc))
+                    mr += dr
+                    mc += dc
+
+        pins = {}
+        for dirs, sliders in ((DIAGONALS, "bq"), (ORTHOGONALS, "rq")):
+            for dr, dc in dirs:
+                mr, mc = kr + dr, kc + dc
+                own = None
+                while 0 <= mr < 8 and 0 <= mc < 8:
+                    p = board[mr][mc]
+                    if p:
+                        if p[0] != color:
+                            if own and p[1] in sliders:
+                                pins[own] = (dr, dc)
+                            break
+                        if own:
+                            break
+                        own = (mr, mc)
+                    mr += dr
+                    mc += dc
+        return evasions, pins
+
+    def legal_targets(self, r, c, p, king, evasions, pins, captures_only):
+        # King moves and en passant are checked by playing them; everything
+        # else only has to answer a check and stay on its pin ray.
+        legal = []
+        pin = pins.get((r, c))
+        for dst in self.potential_moves(r, c, captures_only):
+            if captures_only and not self.is_tactical(p, c, *dst):
+                continue
+            if p[1] == "k" or (p[1] == "p" and dst == self.en_passant):
+                undo = self.make_move((r, c), dst)
+                if not self.is_in_check(p[0]):
+                    legal.append(((r, c), dst))
+                self.unmake_move(undo)
+                continue
+            if evasions is not None and dst not in evasions:
+                continue
+            if pin and (dst[0] - king[0]) * pin[1] != (dst[1] - king[1]) * pin[0]:
+                continue
+            legal.append(((r, c), dst))
+        return legal
 
-    def get_legal_moves(self, color):
+    def get_legal_moves(self, color, captures_only=False):
+        king = self.kings[color]
+        if king is None:
+            return []
+        evasions, pins = self.check_state(color, king)
         legal = []
         for r in range(8):
             for c in range(8):
                 p = self.board[r][c]
                 if not p or find_color(p) != color:
                     continue
-                for go_r, go_c in self.potential_moves(r, c):
-                    snap = self.snapshot()
-                    self.make_move((r, c), (go_r, go_c))
-                    if not self.is_in_check(color):
-                        legal.append(((r, c), (go_r, go_c)))
-                    self.restore(snap)
+                legal += self.legal_targets(
+                    r, c, p, king, evasions, pins, captures_only
+                )
         return legal
 
+    def position_info(self):
+        # Legal moves, check flags and game state of the current position,
+        # remembered by hash: a move, undo or restore changes the hash, so
+        # stale entries are never read and revisited positions cost nothing.
+        info = self.position_cache.get(self.hash)
+        if info is None:
+            if len(self.position_cache) >= POSITION_CACHE_SIZE:
+                self.position_cache.clear()
+            moves = self.get_legal_moves(self.turn)
+            check = {color: self.is_in_check(color) for color in "wb"}
+            if moves:
+                state = None
+            else:
+                state = "checkmate" if check[self.turn] else "stalemate"
+            info = (moves, check, state)
+            self.position_cache[self.hash] = info
+        return info
+
+    def legal_moves(self):
+        return self.position_info()[0]
+
+    def in_check(self, color):
+        return self.position_info()[1][color]
+
+    def game_state(self):
+        return self.position_info()[2]
+
+    def is_tactical(self, piece, c0, r1, c1):
+        if self.board[r1][c1]:
+            return True
+        return piece[1] == "p" and (c0 != c1 or r1 == 0 or r1 == 7)
+
+    def parse_move(self, text):
+        # coordinate ("e2e4", "e7e8n") or SAN ("Nf3", "exd5", "O-O", "e8=Q+")
+        move = text.strip().rstrip("+#!?")
+        legal = self.get_legal_moves(self.turn)
+        if len(move) in (4, 5) and move[:4].isalnum() and move[1] in "12345678":
+            if move[3] in "12345678" and move[0] in "abcdefgh":
+                src, dst = parse_square(move[:2]), parse_square(move[2:4])
+                if (src, dst) in legal:
+                    return self.check_promotion(text, src, dst, move[4:].lower())
+
+        if move.replace("0", "O") in ("O-O", "O-O-O"):
+            c1 = 6 if len(move) == 3 else 2
+            for src, dst in legal:
+                if self.board[src[0]][src[1]][1] == "k" and dst[1] - src[1] in (2, -2):
+                    if dst[1] == c1:
+                        return src, dst, None
+            raise ValueError(f"illegal move: {text}")
+
+        promotion = None
+        if "=" in move:
+            move, promotion = move.split("=")
+            promotion = promotion.lower()
+        elif move[-1] in "QRBN" and len(move) > 2 and move[-2] in "18":
+            move, promotion = move[:-1], move[-1].lower()
+        type = move[0].lower() if move[0] in "KQRBN" else "p"
+        if type != "p":
+            move = move[1:]
+        if len(move) < 2:
+            raise ValueError(f"bad move: {text}")
+        dst = parse_square(move[-2:])
+        hint = move[:-2].replace("x", "")
+
+        found = []
+        for src, to in legal:
+            if to != dst or self.board[src[0]][src[1]][1] != type:
+                continue
+            name = square_name(src)
+            if all(ch in name for ch in hint):
+                found.append((src, dst, promotion))
+        if len(found) != 1:
+            raise ValueError(f"{'ambiguous' if found else 'illegal'} move: {text}")
+        return self.check_promotion(text, *found[0])
+
+    def check_promotion(self, text, src, dst, promotion):
+        if not promotion:
+            return src, dst, None
+        if promotion not in ("q", "r", "b", "n"):
+            raise ValueError(f"bad promotion piece: {text}")
+        if self.board[src[0]][src[1]][1] != "p" or dst[0] not in (0, 7):
+            raise ValueError(f"promotion on a non-promoting move: {text}")
+        return src, dst, promotion
+
+    def san(self, src, dst, promotion=None):
+        piece = self.board[src[0]][src[1]]
+        type = piece[1]
+        if type == "k" and abs(dst[1] - src[1]) == 2:
+            text = "O-O" if dst[1] > src[1] else "O-O-O"
+        else:
+            capture = self.board[dst[0]][dst[1]] or (type == "p" and src[1] != dst[1])
+            if type == "p":
+                text = square_name(src)[0] if capture else ""
+            else:
+                text = type.upper()
+                rivals = [
+                    s
+                    for s, d in self.legal_moves()
+                    if d == dst and s != src and self.board[s[0]][s[1]] == piece
+                ]
+                if rivals:
+                    name = square_name(src)
+                    if all(s[1] != src[1] for s in rivals):
+                        text += name[0]
+                    elif all(s[0] != src[0] for s in rivals):
+                        text += name[1]
+                    else:
+                        text += name
+            text += ("x" if capture else "") + square_name(dst)
+            if type == "p" and dst[0] in (0, 7):
+                promotion = promotion or "q"
+                text += "=" + promotion.upper()
+
+        undo = self.make_move(src, dst, lambda color: promotion)
+        if self.game_state() == "checkmate":
+            text += "#"
+        elif self.in_check(self.turn):
+            text += "+"
+        self.unmake_move(undo)
+        return text
+
+    # history[ply] is the undo record of the move that reached that ply, or None
+    # where the position was set directly; full positions are only kept in
+    # checkpoints, at ply 0, every CHECKPOINT_EVERY plies and at set positions.
+    # A loaded game keeps moves as UCI text and checkpoints as FEN until a seek
+    # first passes through them.
+    def reset_history(self):
+        self.history_index = 0
+        self.history = [None]
+        self.checkpoints = {0: self.snapshot()}
+
+    def load_history(self, moves, checkpoints):
+        self.history = list(moves)
+        self.checkpoints = dict(checkpoints)
+        self.history_index = 0
+        self.rebuild(len(self.history) - 1)
+
+    def truncate_history(self):
+        del self.history[self.history_index + 1 :]
+        for ply in [k for k in self.checkpoints if k > self.history_index]:
+            del self.checkpoints[ply]
+
     def do_move(self, src, dst, promotion_callback=None):
-        if self.history_index < len(self.history) - 1:
-            self.history = self.history[: self.history_index + 1]
-        self.make_move(src, dst, promotion_callback)
+        self.truncate_history()
+        self.history.append(self.make_move(src, dst, promotion_callback))
         self.history_index += 1
-        self.history.append(self.snapshot((src, dst)))
+        if self.history_index % CHECKPOINT_EVERY == 0:
+            self.checkpoints[self.history_index] = self.snapshot()
+
+    def place(self, fen):
+        self.truncate_history()
+        self.read_fen(fen)
+        self.history.append(None)
+        self.history_index += 1
+        self.checkpoints[self.history_index] = self.snapshot()
 
     def undo(self):
         if self.history_index > 0:
+            undo = self.history[self.history_index]
             self.history_index -= 1
-            self.restore(self.history[self.history_index])
+            if isinstance(undo, tuple):
+                self.unmake_move(undo)
+            else:
+                self.rebuild(self.history_index)
 
     def forward(self):
         if self.history_index < len(self.history) - 1:
             self.history_index += 1
-            self.restore(self.history[self.history_index])
+            undo = self.history[self.history_index]
+            if undo is None:
+                self.restore_checkpoint(self.history_index)
+                return
+            if isinstance(undo, str):
+                src, dst, promoted = self.parse_move(undo)
+            else:
+                src, dst, promoted = undo[0], undo[1], undo[8] and undo[8][1]
+            self.history[self.history_index] = self.make_move(
+                src, dst, lambda color: promoted
+            )
+
+    def restore_checkpoint(self, ply):
+        snap = self.checkpoints[ply]
+        if isinstance(snap, str):
+            self.read_fen(snap)
+            self.checkpoints[ply] = self.snapshot()
+        else:
+            self.restore(snap)
+
+    def rebuild(self, ply):
+        base = max(k for k in self.checkpoints if k <= ply)
+        self.restore_checkpoint(base)
+        self.history_index = base
+        while self.history_index < ply:
+            self.forward()
+
+    def seek(self, ply):
+        ply = max(0, min(ply, len(self.history) - 1))
+        base = max(k for k in self.checkpoints if k <= ply)
+        if base <= self.history_index <= ply:
+            while self.history_index < ply:
+                self.forward()
+        elif ply < self.history_index <= 2 * ply - base:
+            while self.history_index > ply:
+                self.undo()
+        else:
+            self.rebuild(ply)
+
+    def last_move(self):
+        undo = self.history[self.history_index]
+        if isinstance(undo, str):
+            return parse_square(undo[:2]), parse_square(undo[2:4])
+        return (undo[0], undo[1]) if undo else None
 
     def snapshot(self, last_move=None):
         return {
@@ -257,9 +854,98 @@ class ChessLogic:
             "last_move": deepcopy(last_move),
         }
 
+    def load_fen(self, fen):
+        self.read_fen(fen)
+        self.reset_history()
+
+    def read_fen(self, fen):
+        fields = fen.split()
+        board = []
+        for row in fields[0].split("/"):
+            cells = []
+            for ch in row:
+                if ch.isdigit():
+                    cells += [""] * int(ch)
+                elif ch.lower() in "pnbrqk":
+                    cells.append(("w" if ch.isupper() else "b") + ch.lower())
+                else:
+                    raise ValueError(f"bad FEN piece: {ch}")
+            board.append(cells)
+        if len(board) != 8 or any(len(row) != 8 for row in board):
+            raise ValueError(f"bad FEN board: {fields[0]}")
+        for color in ("w", "b"):
+            if sum(row.count(color + "k") for row in board) != 1:
+                raise ValueError(f"FEN needs one king per side: {fields[0]}")
+
+        turn = fields[1] if len(fields) > 1 else "w"
+        castling = fields[2] if len(fields) > 2 else "-"
+        en_passant = fields[3] if len(fields) > 3 else "-"
+        if turn not in ("w", "b"):
+            raise ValueError(f"bad FEN side to move: {turn}")
+        if castling != "-" and (not castling or set(castling) - set("KQkq")):
+            raise ValueError(f"bad FEN castling rights: {castling}")
+        if en_passant != "-" and (
+            len(en_passant) != 2
+            or en_passant[0] not in "abcdefgh"
+            or en_passant[1] != ("6" if turn == "w" else "3")
+        ):
+            raise ValueError(f"bad FEN en passant square: {en_passant}")
+        self.board = board
+        self.turn = turn
+        self.defined_castling = {
+            "wR0": "Q" not in castling,
+            "wR7": "K" not in castling,
+            "bR0": "q" not in castling,
+            "bR7": "k" not in castling,
+        }
+        self.en_passant = None if en_passant == "-" else parse_square(en_passant)
+        self.refresh()
+
+    def fen(self):
+        rows = []
+        for row in self.board:
+            text = ""
+            empty = 0
+            for p in row:
+                if not p:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += p[1].upper() if p[0] == "w" else p[1]
+            rows.append(text + (str(empty) if empty else ""))
+
+        castling = ""
+        for key, flag in (("wR7", "K"), ("wR0", "Q"), ("bR7", "k"), ("bR0", "q")):
+            if not self.defined_castling[key]:
+                castling += flag
+        en_passant = square_name(self.en_passant) if self.en_passant else "-"
+        return f"{'/'.join(rows)} {self.turn} {castling or '-'} {en_passant} 0 1"
+
+    def copy(self):
+        other = type(self)()
+        other.restore(self.snapshot())
+        other.reset_history()
+        return other
+
     def restore(self, snap):
         self.board = deepcopy(snap["board"])
         self.turn = snap["turn"]
         self.defined_castling = deepcopy(snap["has_moved"])
         self.en_passant = snap["en_passant"]
+        self.refresh()
         return snap.get("last_move", None)
+
+
+BACKENDS = ("list", "bitboard")
+
+
+def create_logic(backend="list"):
+    if backend == "bitboard":
+        from chess_bitboard import BitboardLogic
+
+        return BitboardLogic()
+    if backend != "list":
+        raise ValueError(f"unknown logic backend: {backend}")
+    return ChessLogic()
@@ -0,0 +1,187 @@
+import argparse
+import re
+import sys
+import time
+
+from chess_journal import JOURNAL_PATH, Journal
+from chess_logic import BACKENDS, create_logic, enemy
+
+# Games are read line by line and handed out one at a time, so a collection of
+# any size is replayed in constant memory. Comments, variations, NAGs and move
+# numbers are dropped; what is left of a game are its tags and its SAN moves.
+TAG = re.compile(r'\[(\w+)\s+"((?:[^"\\]|\\.)*)"\]')
+TOKEN = re.compile(r"[{};()]|[^\s{};()]+")
+ESCAPE = re.compile(r"\\(.)")
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+RESULTS = ("1-0", "0-1", "1/2-1/2", "*")
+START_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+SEVEN_TAGS = ("Event", "Site", "Date", "Round", "White", "Black", "Result")
+LINE_WIDTH = 80
+
+
+def movetext_tokens(line, state):
+    # state is [variation depth, inside a brace comment] and carries over lines
+    tokens = []
+    for token in TOKEN.findall(line):
+        if state[1]:
+            state[1] = token != "}"
+        elif token == "{":
+            state[1] = True
+        elif token == ";":
+            break
+        elif token == "(":
+            state[0] += 1
+        elif token == ")":
+            state[0] = max(0, state[0] - 1)
+        elif not state[0] and token[0] != "$":
+            token = MOVE_NUMBER.sub("", token)
+            if token:
+                tokens.append(token)
+    return tokens
+
+
+def read_games(f):
+    headers = {}
+    moves = []
+    state = [0, False]
+    for line in f:
+        if line.startswith("%"):
+            continue
+        if line.startswith("[") and not any(state):
+            if moves:
+                yield headers, moves
+                headers, moves = {}, []
+            for key, value in TAG.findall(line):
+                headers[key] = ESCAPE.sub(r"\1", value)
+            continue
+        for token in movetext_tokens(line, state):
+            if token in RESULTS:
+                headers.setdefault("Result", token)
+                yield headers, moves
+                headers, moves = {}, []
+            else:
+                moves.append(token)
+    if headers or moves:
+        yield headers, moves
+
+
+def play(headers, moves, backend="list"):
+    # Yields the position before each move together with the move, then plays
+    # it; an unreadable or illegal move raises ValueError
+    logic = create_logic(backend)
+    if "FEN" in headers:
+        logic.load_fen(headers["FEN"])
+    for token in moves:
+        src, dst, promotion = logic.parse_move(token)
+        yield logic, (src, dst, promotion)
+        logic.make_move(src, dst, lambda color: promotion)
+
+
+def game_moves(logic):
+    # The moves of a ChessLogic history from its first ply, up to the first
+    # position that was set directly and cannot be written as a move
+    game = type(logic)()
+    start = logic.checkpoints[0]
+    if isinstance(start, str):
+        game.read_fen(start)
+    else:
+        game.restore(start)
+    fen = game.fen()
+    moves = []
+    for undo in logic.history[1:]:
+        if undo is None:
+            break
+        if isinstance(undo, str):
+            src, dst, promotion = game.parse_move(undo)
+        else:
+            src, dst, promotion = undo[0], undo[1], undo[8] and undo[8][1]
+        moves.append(game.san(src, dst, promotion))
+        game.make_move(src, dst, lambda color: promotion)
+    return fen, moves, game
+
+
+def result_of(game):
+    state = game.game_state()
+    if state == "checkmate":
+        return "0-1" if game.turn == "w" else "1-0"
+    return "1/2-1/2" if state == "stalemate" else "*"
+
+
+def write_game(f, logic, headers=None):
+    fen, moves, game = game_moves(logic)
+    tags = {key: "?" for key in SEVEN_TAGS}
+    tags["Result"] = result_of(game)
+    if fen != START_FEN:
+        tags["SetUp"] = "1"
+        tags["FEN"] = fen
+    tags.update(headers or {})
+    for key, value in tags.items():
+        value = str(value).replace("\\", "\\\\").replace('"', '\\"')
+        f.write(f'[{key} "{value}"]\n')
+    f.write("\n")
+
+    words = []
+    turn = fen.split()[1]
+    for i, san in enumerate(moves):
+        if turn == "w":
+            words.append(f"{i // 2 + 1}.")
+        elif not i:
+            words.append("1...")
+        words.append(san)
+        turn = enemy(turn)
+    words.append(tags["Result"])
+
+    line = ""
+    for word in words:
+        if line and len(line) + 1 + len(word) > LINE_WIDTH:
+            f.write(line + "\n")
+            line = word
+        else:
+            line = f"{line} {word}" if line else word
+    f.write(line + "\n\n")
+
+
+def replay_file(path, backend="list"):
+    games = plies = errors = 0
+    start = time.perf_counter()
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for headers, moves in read_games(f):
+            games += 1
+            try:
+                for _ in play(headers, moves, backend):
+                    plies += 1
+            except ValueError as e:
+                errors += 1
+                print(f"⚠️ game {games}: {e}")
+    return games, plies, errors, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Read and write PGN games.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    check = sub.add_parser("replay", help="play every game of a PGN file")
+    check.add_argument("pgn")
+    check.add_argument("--backend", choices=BACKENDS, default="list")
+    export = sub.add_parser("export", help="write the saved game as PGN")
+    export.add_argument("journal", nargs="?", default=JOURNAL_PATH)
+    export.add_argument("-o", "--output", default="chess_game.pgn")
+    args = parser.parse_args(argv)
+
+    if args.command == "replay":
+        games, plies, errors, elapsed = replay_file(args.pgn, args.backend)
+        print(
+            f"{'✅' if not errors else '❌'} {games} games, {plies} plies, "
+            f"{errors} failed in {elapsed:.2f}s "
+            f"({plies / elapsed if elapsed else 0:,.0f} plies/s)"
+        )
+        return 1 if errors else 0
+
+    logic = Journal(args.journal).load()
+    with open(args.output, "w", encoding="utf-8") as f:
+        write_game(f, logic)
+    print(f"✅ Game written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,426 @@
+import argparse
+import os
+import sys
+import time
+import zlib
+from array import array
+
+from chess_logic import (
+    DIAGONALS,
+    KING_STEPS,
+    KNIGHT_STEPS,
+    ORTHOGONALS,
+    create_logic,
+    enemy,
+    move_name,
+)
+
+TABLEBASE_DIR = "tablebases"
+DEFAULT_SETS = ("KQvK", "KRvK", "KPvK")
+MAX_PIECES = 4
+PIECE_ORDER = "kqrbnp"
+STRENGTH = {"k": 0, "q": 9, "r": 5, "b": 3, "n": 3, "p": 1}
+
+# One byte per position, from the side to move: 0 draw, 1..127 win in that
+# many plies, 128 + n loss in n plies (128 is checkmated), 255 unused index.
+DRAW, LOSS, INVALID = 0, 128, 255
+MAX_PLIES = 126
+NO_LOSS = 0xFFFF
+
+# The white king is folded into a1-d1-d4 for pawnless sets and onto files a-d
+# when pawns fix the board's orientation.
+TRIANGLE = [(r, c) for c in range(4) for r in range(7 - c, 8)]
+LEFT_HALF = [(r, c) for r in range(8) for c in range(4)]
+SLIDES = {"b": DIAGONALS, "r": ORTHOGONALS, "q": DIAGONALS + ORTHOGONALS}
+STEPS = {"k": KING_STEPS, "n": KNIGHT_STEPS}
+
+
+def transform(square, t):
+    r, c = square
+    if t & 1:
+        c = 7 - c
+    if t & 2:
+        r = 7 - r
+    if t & 4:
+        r, c = c, r
+    return r, c
+
+
+def side_string(pieces):
+    return "".join(sorted(pieces, key=PIECE_ORDER.index)).upper()
+
+
+def normalize(material):
+    # the stronger side is always stored as white
+    white, black = material.upper().split("V")
+    white, black = side_string(white.lower()), side_string(black.lower())
+
+    def strength(side):
+        return sum(STRENGTH[p] for p in side.lower()), len(side), side
+
+    if strength(black) > strength(white):
+        return f"{black}v{white}", True
+    return f"{white}v{black}", False
+
+
+def board_material(board):
+    pieces = {"w": [], "b": []}
+    for row in board:
+        for p in row:
+            if p:
+                pieces[p[0]].append(p[1])
+    return f"{side_string(pieces['w'])}v{side_string(pieces['b'])}"
+
+
+class Table:
+    def __init__(self, material, values=None):
+        self.material = material
+        white, black = material.lower().split("v")
+        self.pieces = ["w" + p for p in white] + ["b" + p for p in black]
+        self.pawns = "p" in material.lower()
+        self.transforms = (0, 1) if self.pawns else range(8)
+        self.king_squares = LEFT_HALF if self.pawns else TRIANGLE
+        self.king_slot = {sq: i for i, sq in enumerate(self.king_squares)}
+        # groups of identical pieces are sorted so their order does not matter
+        self.groups = []
+        for i, p in enumerate(self.pieces):
+            if i and p == self.pieces[i - 1]:
+                self.groups[-1].append(i)
+            else:
+                self.groups.append([i])
+        self.size = 2 * len(self.king_squares) * 64 ** (len(self.pieces) - 1)
+        self.values = values
+
+    def index(self, squares, stm):
+        best = None
+        for t in self.transforms:
+            slot = self.king_slot.get(transform(squares[0], t))
+            if slot is None:
+                continue
+            moved = [r * 8 + c for r, c in (transform(sq, t) for sq in squares)]
+            for group in self.groups:
+                if len(group) > 1:
+                    for i, sq in zip(group, sorted(moved[i] for i in group)):
+                        moved[i] = sq
+            idx = stm * len(self.king_squares) + slot
+            for sq in moved[1:]:
+                idx = idx * 64 + sq
+            if best is None or idx < best:
+                best = idx
+        return best
+
+    def decode(self, idx):
+        squares = []
+        for _ in range(len(self.pieces) - 1):
+            idx, sq = divmod(idx, 64)
+            squares.append((sq // 8, sq % 8))
+        stm, slot = divmod(idx, len(self.king_squares))
+        squares.append(self.king_squares[slot])
+        squares.reverse()
+        return squares, stm
+
+    def lookup(self, board, turn, flip):
+        squares = [None] * len(self.pieces)
+        for r in range(8):
+            for c in range(8):
+                p = board[r][c]
+                if not p:
+                    continue
+                if flip:
+                    p = enemy(p[0]) + p[1]
+                    sq = (7 - r, c)
+                else:
+                    sq = (r, c)
+                i = self.pieces.index(p)
+                while squares[i] is not None:
+                    i += 1
+                squares[i] = sq
+        stm = (turn == "b") != flip
+        return self.values[self.index(squares, int(stm))]
+
+
+def decode_value(value):
+    if value == DRAW or value == INVALID:
+        return 0, 0
+    if value < LOSS:
+        return 1, value
+    return -1, value - LOSS
+
+
+class Tablebases:
+    def __init__(self, directory=TABLEBASE_DIR):
+        self.directory = directory
+        self.tables = {}
+
+    def table(self, material, generate=False):
+        if material not in self.tables:
+            path = os.path.join(self.directory, material + ".tbz")
+            if os.path.exists(path):
+                with open(path, "rb") as f:
+                    values = bytearray(zlib.decompress(f.read()))
+                self.tables[material] = Table(material, values)
+            elif generate:
+                self.tables[material] = generate_table(material, self)
+                save_table(self.tables[material], self.directory)
+            else:
+                self.tables[material] = None
+        return self.tables[material]
+
+    def probe_board(self, board, turn, generate=False):
+        material = board_material(board)
+        if material == "KvK":
+            return 0, 0
+        material, flip = normalize(material)
+        table = self.table(material, generate)
+        if table is None:
+            return None
+        return decode_value(table.lookup(board, turn, flip))
+
+    def probe(self, logic):
+        # (result, plies) for the side to move, or None when no table applies;
+        # tables assume no castling rights, and en passant cannot come up
+        # because no table has pawns on both sides
+        if logic.piece_count > MAX_PIECES:
+            return None
+        castle = logic.defined_castling
+        if logic.kings["w"] == (7, 4) and not (castle["wR0"] and castle["wR7"]):
+            return None
+        if logic.kings["b"] == (0, 4) and not (castle["bR0"] and castle["bR7"]):
+            return None
+        return self.probe_board(logic.board, logic.turn)
+
+    def best_move(self, logic):
+        if self.probe(logic) is None:
+            return None
+        best = None
+        best_key = None
+        for mv in logic.get_legal_moves(logic.turn):
+            undo = logic.make_move(*mv)
+            child = self.probe(logic)
+            logic.unmake_move(undo)
+            if child is None:
+                return None
+            result, plies = -child[0], child[1] + 1
+            # wins as fast as possible, then draws, then the longest loss
+            key = (result, -plies if result > 0 else plies)
+            if best_key is None or key > best_key:
+                best_key = key
+                best = (mv, result, plies)
+        return best
+
+
+def setup(logic, table, squares, stm):
+    board = [[""] * 8 for _ in range(8)]
+    for p, (r, c) in zip(table.pieces, squares):
+        board[r][c] = p
+    logic.board = board
+    logic.turn = "wb"[stm]
+    logic.en_passant = None
+    logic.defined_castling = dict.fromkeys(logic.defined_castling, True)
+    logic.refresh()
+
+
+def valid_squares(table, squares):
+    if len(set(squares)) != len(squares):
+        return False
+    return all(p[1] != "p" or 0 < sq[0] < 7 for p, sq in zip(table.pieces, squares))
+
+
+def unmoves(table, squares, stm):
+    # positions one move earlier inside the same table: the side that just
+    # moved steps a piece back onto an empty square
+    mover = "bw"[stm]
+    occupied = set(squares)
+    found = set()
+    for i, (p, (r, c)) in enumerate(zip(table.pieces, squares)):
+        if p[0] != mover:
+            continue
+        origins = []
+        if p[1] == "p":
+            back = 1 if mover == "w" else -1
+            double = (r + 2 * back, c)
+            if 0 < r + back < 7 and (r + back, c) not in occupied:
+                origins.append((r + back, c))
+                if r == (4 if mover == "w" else 3) and double not in occupied:
+                    origins.append(double)
+        elif p[1] in STEPS:
+            for dr, dc in STEPS[p[1]]:
+                sq = (r + dr, c + dc)
+                if 0 <= sq[0] < 8 and 0 <= sq[1] < 8 and sq not in occupied:
+                    origins.append(sq)
+        else:
+            for dr, dc in SLIDES[p[1]]:
+                sr, sc = r + dr, c + dc
+                while 0 <= sr < 8 and 0 <= sc < 8 and (sr, sc) not in occupied:
+                    origins.append((sr, sc))
+                    sr += dr
+                    sc += dc
+        for origin in origins:
+            before = list(squares)
+            before[i] = origin
+            found.add(table.index(before, 1 - stm))
+    return found
+
+
+def generate_table(material, tablebases, backend="bitboard", log=print):
+    material, _ = normalize(material)
+    table = Table(material)
+    size = table.size
+    if len(table.pieces) > MAX_PIECES:
+        raise ValueError(f"{material}: at most {MAX_PIECES} pieces")
+    white, black = material.lower().split("v")
+    if "p" in white and "p" in black:
+        raise ValueError(f"{material}: pawns on both sides are not supported")
+
+    start = time.perf_counter()
+    logic = create_logic(backend)
+    values = bytearray(size)
+    degree = array("H", bytes(2 * size))
+    slowest_loss = bytearray(size)
+    buckets = [[] for _ in range(MAX_PLIES + 2)]
+
+    # forward pass: legal moves from every position, with captures and
+    # promotions looked up in the smaller tables
+    for idx in range(size):
+        squares, stm = table.decode(idx)
+        if not valid_squares(table, squares) or table.index(squares, stm) != idx:
+            values[idx] = INVALID
+            continue
+        setup(logic, table, squares, stm)
+        if logic.is_in_check(enemy(logic.turn)):
+            values[idx] = INVALID
+            continue
+        legal = logic.get_legal_moves(logic.turn)
+        if not legal:
+            if logic.is_in_check(logic.turn):
+                values[idx] = LOSS
+                buckets[0].append(idx)
+            continue
+
+        position = {sq: i for i, sq in enumerate(squares)}
+        successors = set()
+        fastest_win = None
+        escape = False
+        for src, dst in legal:
+            promotion = logic.board[src[0]][src[1]][1] == "p" and dst[0] in (0, 7)
+            if logic.board[dst[0]][dst[1]] or promotion:
+                undo = logic.make_move(src, dst)
+                result, plies = tablebases.probe_board(logic.board, logic.turn, True)
+                logic.unmake_move(undo)
+                if result < 0:
+                    if fastest_win is None or plies + 1 < fastest_win:
+                        fastest_win = plies + 1
+                elif result == 0:
+                    escape = True
+                else:
+                    slowest_loss[idx] = max(slowest_loss[idx], plies)
+                continue
+            after = list(squares)
+            after[position[src]] = dst
+            successors.add(table.index(after, 1 - stm))
+
+        if fastest_win is not None:
+            if fastest_win > MAX_PLIES:
+                raise ValueError(f"{material}: mate too long")
+            values[idx] = fastest_win
+            buckets[fastest_win].append(idx)
+            degree[idx] = NO_LOSS
+        elif escape:
+            degree[idx] = NO_LOSS
+        elif successors:
+            degree[idx] = len(successors)
+        else:
+            # every move leaves the table into a lost ending
+            plies = slowest_loss[idx] + 1
+            if plies > MAX_PLIES:
+                raise ValueError(f"{material}: mate too long")
+            values[idx] = LOSS + plies
+            buckets[plies].append(idx)
+
+    # retrograde pass, one ply at a time
+    for level in range(MAX_PLIES + 1):
+        for idx in buckets[level]:
+            value = values[idx]
+            result, plies = decode_value(value)
+            if plies != level:
+                continue
+            squares, stm = table.decode(idx)
+            for before in unmoves(table, squares, stm):
+                old = values[before]
+                if old == INVALID:
+                    continue
+                if result < 0:
+                    if old == DRAW or (old < LOSS and old > level + 1):
+                        if level + 1 > MAX_PLIES:
+                            raise ValueError(f"{material}: mate too long")
+                        values[before] = level + 1
+                        buckets[level + 1].append(before)
+                elif old == DRAW and degree[before] != NO_LOSS:
+                    degree[before] -= 1
+                    if degree[before] == 0:
+                        plies = max(level, slowest_loss[before]) + 1
+                        if plies > MAX_PLIES:
+                            raise ValueError(f"{material}: mate too long")
+                        values[before] = LOSS + plies
+                        buckets[plies].append(before)
+        buckets[level] = None
+
+    table.values = values
+    wins = sum(1 for v in values if 0 < v < LOSS)
+    losses = sum(1 for v in values if LOSS <= v < INVALID)
+    log(
+        f"✅ {material}: {wins} wins, {losses} losses in "
+        f"{time.perf_counter() - start:.1f}s"
+    )
+    return table
+
+
+def save_table(table, directory=TABLEBASE_DIR):
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, table.material + ".tbz")
+    with open(path, "wb") as f:
+        f.write(zlib.compress(bytes(table.values), 9))
+    return path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Generate or probe endgame tablebases."
+    )
+    parser.add_argument("--dir", default=TABLEBASE_DIR)
+    sub = parser.add_subparsers(dest="command", required=True)
+    gen = sub.add_parser("generate", help="build tables and the ones they need")
+    gen.add_argument("materials", nargs="*", default=list(DEFAULT_SETS))
+    gen.add_argument("--backend", default="bitboard")
+    probe = sub.add_parser("probe", help="look up a position")
+    probe.add_argument("fen")
+    args = parser.parse_args(argv)
+
+    tablebases = Tablebases(args.dir)
+    if args.command == "generate":
+        for material in args.materials:
+            material, _ = normalize(material)
+            if tablebases.table(material) is None:
+                tablebases.tables.pop(material)
+                table = generate_table(material, tablebases, args.backend)
+                path = save_table(table, args.dir)
+                tablebases.tables[material] = table
+                print(f"✅ Saved {path}")
+            else:
+                print(f"♻️ {material} already in {args.dir}")
+        return 0
+
+    logic = create_logic()
+    logic.load_fen(args.fen)
+    found = tablebases.best_move(logic)
+    if found is None:
+        print("⚠️ No table for this position")
+        return 1
+    mv, result, plies = found
+    outcome = {1: "win", 0: "draw", -1: "loss"}[result]
+    print(f"{outcome} in {plies} plies, best move {move_name(*mv)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())